@@ -1,16 +1,26 @@
 from __future__ import annotations
 
-import uuid
+import asyncio
+import heapq
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from operator import itemgetter
+from weakref import WeakKeyDictionary
 from typing import Dict, List, Optional, Tuple
-import re
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException, Depends, Header, status
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, status
+from fastapi.responses import ORJSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+from cachetools import TTLCache
 
-from learnus_client import LearnUsClient, LearnUsLoginError
+from learnus_client import LEARNUS_RETRY, LearnUsClient, LearnUsLoginError
 
 try:
     from zoneinfo import ZoneInfo  # Python 3.9+
@@ -19,13 +29,37 @@ except ImportError:  # Fallback for older versions
 
 KST = ZoneInfo("Asia/Seoul")
 
-app = FastAPI(title="LearnUs Alimi API")
 
-# In-memory session store {token: LearnUsClient}
-_SESSIONS: Dict[str, LearnUsClient] = {}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One connection pool for every LearnUs session so TLS connections to
+    # ys.learnus.org / infra.yonsei.ac.kr are reused across logins.
+    app.state.http = HTTPAdapter(pool_connections=4, pool_maxsize=64, max_retries=LEARNUS_RETRY)
+    # Long-lived worker threads for blocking LearnUsClient calls, kept apart
+    # from the default executor; created per lifespan so a restart gets a live pool.
+    app.state.io_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="learnus-io")
+    yield
+    app.state.io_pool.shutdown(wait=False, cancel_futures=True)
+    app.state.http.close()
 
-# Course cache {client_id: {course_id: (last_access_time, activities)}}
-_COURSE_CACHE: Dict[int, Dict[int, Tuple[float, List]]] = {}
+
+app = FastAPI(title="LearnUs Alimi API", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# In-memory session store {token: LearnUsClient}; bounded, and entries expire
+# SESSION_TTL seconds after login (TTLCache evicts on access, no purge loop).
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(6 * 3600)))
+_SESSIONS: TTLCache = TTLCache(maxsize=1024, ttl=SESSION_TTL)
+_SESSIONS_LOCK = threading.RLock()
+
+# Course cache {client: {course_id: (last_access_time, activities, etag)}}, LRU-ordered.
+# Keyed weakly on the client itself so entries die with their session and can
+# never be picked up by a new client that happens to reuse the same id().
+_COURSE_CACHE: WeakKeyDictionary[LearnUsClient, OrderedDict[int, Tuple[float, List, Optional[str]]]] = WeakKeyDictionary()
+_COURSE_CACHE_MAX = 64  # courses kept per client
+_COURSE_CACHE_LOCK = threading.Lock()
+
+# Max concurrent LearnUs page fetches per /events request
+_FETCH_CONCURRENCY = 16
 
 
 class LoginRequest(BaseModel):
@@ -39,101 +73,154 @@ class LoginResponse(BaseModel):
 
 # -------------------------------- Utils ---------------------------------
 
-def get_client(x_auth_token: Optional[str] = Header(None)) -> LearnUsClient:
-    if not x_auth_token or x_auth_token not in _SESSIONS:
+async def get_client(x_auth_token: Optional[str] = Header(None)) -> LearnUsClient:
+    with _SESSIONS_LOCK:
+        client = _SESSIONS.get(x_auth_token) if x_auth_token else None
+    if client is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing token")
-    return _SESSIONS[x_auth_token]
+    return client
 
 
 def _get_course_activities_cached(client: LearnUsClient, course_id: int, ttl: int = 900):
-    """Return activities from cache if still fresh; otherwise fetch and update cache."""
-    import time
+    """Return activities from cache if still fresh; otherwise fetch and update cache.
 
-    cache = _COURSE_CACHE.setdefault(id(client), {})
-    if course_id in cache and time.time() - cache[course_id][0] < ttl:
-        return cache[course_id][1]
+    A stale entry is revalidated with its ETag first, so an unchanged course page
+    costs a 304 instead of a full download and re-parse.
+    """
+    import time
 
-    activities = client.get_course_activities(course_id)
-    cache[course_id] = (time.time(), activities)
+    with _COURSE_CACHE_LOCK:
+        cache = _COURSE_CACHE.get(client)
+        if cache is None:
+            cache = _COURSE_CACHE[client] = OrderedDict()
+        entry = cache.get(course_id)
+        if entry is not None and time.time() - entry[0] < ttl:
+            cache.move_to_end(course_id)
+            return entry[1]
+
+    etag = entry[2] if entry is not None else None
+    activities, new_etag = client.fetch_course_activities(course_id, etag=etag)
+    if activities is None:  # 304 Not Modified
+        activities = entry[1]
+    with _COURSE_CACHE_LOCK:
+        cache[course_id] = (time.time(), activities, new_etag)
+        cache.move_to_end(course_id)
+        while len(cache) > _COURSE_CACHE_MAX:
+            cache.popitem(last=False)
     return activities
 
 
+def _lookup_course_name(client: LearnUsClient, course_id: int) -> str:
+    """Return the short name of one course from the client's cached course list."""
+    for c in client.get_courses():
+        if c["id"] == course_id:
+            return c["short_name"]
+    return ""
+
+
+async def _run_io(func, *args):
+    """Run a blocking LearnUsClient call on the shared I/O pool."""
+    return await asyncio.get_running_loop().run_in_executor(app.state.io_pool, func, *args)
+
+
+async def _gather_bounded(func, items, limit: int = _FETCH_CONCURRENCY) -> list:
+    """Run blocking `func(item)` for every item on the I/O pool, at most `limit` at a time."""
+    sem = asyncio.Semaphore(limit)
+
+    async def bounded(item):
+        async with sem:
+            return await _run_io(func, item)
+
+    return await asyncio.gather(*map(bounded, items))
+
+
 # -------------------------------- Routes --------------------------------
 
 @app.post("/login", response_model=LoginResponse)
-def login(payload: LoginRequest):
-    client = LearnUsClient()
+async def login(payload: LoginRequest, request: Request):
+    client = LearnUsClient(adapter=request.app.state.http)
     try:
-        client.login(payload.username, payload.password)
+        await _run_io(client.login, payload.username, payload.password)
     except LearnUsLoginError:
         raise HTTPException(status_code=400, detail="로그인에 실패했습니다. 학번/비밀번호를 확인해주세요.")
     except Exception:
         raise HTTPException(status_code=400, detail="로그인 중 알 수 없는 오류가 발생했습니다.")
-    token = uuid.uuid4().hex
-    _SESSIONS[token] = client
+    token = secrets.token_hex(16)
+    with _SESSIONS_LOCK:
+        _SESSIONS[token] = client
     return {"token": token}
 
 
 @app.get("/courses")
-def get_courses(client: LearnUsClient = Depends(get_client)):
-    return client.get_courses()
+async def get_courses(client: LearnUsClient = Depends(get_client)):
+    # Returning the response directly skips FastAPI's jsonable_encoder pass
+    return ORJSONResponse(await _run_io(client.get_courses))
 
 
 @app.get("/events")
-def get_events(course_id: Optional[int] = None, client: LearnUsClient = Depends(get_client)):
+async def get_events(course_id: Optional[int] = None, client: LearnUsClient = Depends(get_client)):
     """Return events aggregated across all courses unless `course_id` is provided."""
 
     # Current time in KST for deadline comparison
     now_kst = datetime.now(KST)
 
-    # Determine course set
+    # Determine course set and map course id to name for prefixing titles
     if course_id is None:
-        course_ids = [c["id"] for c in client.get_courses()]
+        courses = await _run_io(client.get_courses)
+        course_ids = [c["id"] for c in courses]
+        course_name_map = {c["id"]: c["short_name"] for c in courses}
     else:
         course_ids = [course_id]
+        course_name_map = {course_id: await _run_io(_lookup_course_name, client, course_id)}
 
-    calendar_events: List[dict] = []
-    todo_videos: List[dict] = []
-    todo_assigns: List[dict] = []
-    todo_quizzes: List[dict] = []
-
-    # Map course id to name for prefixing titles
-    course_name_map = {
-        c["id"]: re.sub(r"\s*\([^)]*\)$", "", c["name"])
-        for c in client.get_courses()
+    # Output lists are kept per course (calendar + one per activity type) so
+    # each can be sorted on its own and k-way merged at the end.
+    per_course: Dict[int, Dict[str, List[dict]]] = {
+        cid: {"calendar": [], "vod": [], "assign": [], "quiz": []} for cid in course_ids
     }
 
-    # Parallel fetch of course activities with simple ThreadPoolExecutor
+    # Parallel fetch of course activities; the blocking client calls run on the I/O pool
     def fetch(cid):
         return cid, _get_course_activities_cached(client, cid)
 
     activities_by_course: Dict[int, List] = {}
-    from concurrent.futures import ThreadPoolExecutor
-    with ThreadPoolExecutor(max_workers=min(16, len(course_ids))) as pool:
-        for cid, acts in pool.map(fetch, course_ids):
-            activities_by_course[cid] = acts
-
-    # Collect assignments and quizzes that require detail fetch
+    for cid, acts in await _gather_bounded(fetch, course_ids):
+        activities_by_course[cid] = acts
+
+    def emit(cid, a):
+        """Add a pending activity to its to-do list and the calendar."""
+        if a.type == "assign" and a.extra.get("submitted"):
+            return
+        # 마감일을 가져오지 못했거나 이미 지난 항목은 제외
+        if not a.due_time or a.due_time < now_kst:
+            return
+        full_title = f"[{course_name_map.get(cid, '')}] {a.title}"
+        lists = per_course[cid]
+        lists[a.type].append({"id": a.id, "title": full_title, "due": a.due_time})
+        lists["calendar"].append({
+            "id": a.id,
+            "title": full_title,
+            "type": a.type,
+            "completed": a.completed,
+            "start": a.due_time,
+            "allDay": True,
+        })
+
+    # Single pass: emit what is already known, queue the rest for a detail fetch
     assign_need_detail: List[Tuple[int, int, object]] = []  # (course_id, module_id, activity_ref)
     quiz_need_detail: List[Tuple[int, int, object]] = []    # (course_id, module_id, activity_ref)
 
     for cid in course_ids:
-        activities = activities_by_course[cid]
-
-        for a in activities:
-            if a.type == "assign":
-                # Skip if already completed
-                if a.completed:
-                    continue
-                # If due_time already known, we may not need detail fetch
-                if a.due_time is None:
-                    assign_need_detail.append((cid, a.id, a))
+        for a in activities_by_course[cid]:
+            if a.completed:
+                continue
+            if a.type == "assign" and a.due_time is None:
+                assign_need_detail.append((cid, a.id, a))
             elif a.type == "quiz":
-                # Skip if already completed
-                if a.completed:
-                    continue
                 # Quizzes always need detail fetch for due_time
                 quiz_need_detail.append((cid, a.id, a))
+            else:
+                emit(cid, a)
 
     # Fetch assignment details in parallel
     def fetch_assign(module_id):
@@ -143,93 +230,53 @@ def get_events(course_id: Optional[int] = None, client: LearnUsClient = Depends(
         return module_id, client.get_quiz_detail(module_id)
 
     if assign_need_detail:
-        with ThreadPoolExecutor(max_workers=min(16, len(assign_need_detail))) as pool:
-            for module_id, detail in pool.map(lambda t: fetch_assign(t[1]), assign_need_detail):
-                # find corresponding activity object
-                for cid, mid, act in assign_need_detail:
-                    if mid == module_id:
-                        act.extra.update(detail)
-                        if detail.get("due_time") and act.due_time is None:
-                            act.due_time = detail["due_time"]
-                        break
+        assign_by_mid = {mid: (cid, act) for cid, mid, act in assign_need_detail}
+        for module_id, detail in await _gather_bounded(fetch_assign, list(assign_by_mid)):
+            cid, act = assign_by_mid[module_id]
+            act.extra.update(detail)
+            if detail.get("due_time") and act.due_time is None:
+                act.due_time = detail["due_time"]
+            emit(cid, act)
 
     # Fetch quiz details in parallel
     if quiz_need_detail:
-        with ThreadPoolExecutor(max_workers=min(16, len(quiz_need_detail))) as pool:
-            for module_id, detail in pool.map(lambda t: fetch_quiz(t[1]), quiz_need_detail):
-                # find corresponding activity object
-                for cid, mid, act in quiz_need_detail:
-                    if mid == module_id:
-                        act.extra.update(detail)
-                        if detail.get("due_time"):
-                            act.due_time = detail["due_time"]
-                        break
-
-    # Now build lists
-    for cid in course_ids:
-        activities = activities_by_course[cid]
-
-        for a in activities:
-            full_title = f"[{course_name_map.get(cid, '')}] {a.title}"
-
-            if a.type == "assign":
-                # Re-evaluate after details
-                if a.completed or a.extra.get("submitted"):
-                    continue
-                if not a.due_time:
-                    continue
-                # Skip past deadline
-                if a.due_time < now_kst:
-                    continue
-                todo_assigns.append({"id": a.id, "title": full_title, "due": a.due_time.isoformat()})
-            elif a.type == "vod":
-                if a.completed or not a.due_time:
-                    continue
-                if a.due_time < now_kst:
-                    continue
-                todo_videos.append({"id": a.id, "title": full_title, "due": a.due_time.isoformat()})
-            elif a.type == "quiz":
-                if a.completed:
-                    continue
-                # 퀴즈는 항상 마감일이 있음
-                if not a.due_time:
-                    continue  # 마감일을 가져오지 못한 경우 제외
-                if a.due_time < now_kst:
-                    continue
-                todo_quizzes.append({"id": a.id, "title": full_title, "due": a.due_time.isoformat()})
-
-            if a.due_time:
-                calendar_events.append({
-                    "id": a.id,
-                    "title": full_title,
-                    "type": a.type,
-                    "completed": a.completed,
-                    "start": a.due_time.isoformat(),
-                    "allDay": True,
-                })
-
-    # Sort
-    calendar_events.sort(key=lambda x: x["start"])
-    todo_videos.sort(key=lambda x: x["due"])
-    todo_assigns.sort(key=lambda x: x["due"])
-    todo_quizzes.sort(key=lambda x: x["due"])
-
-    return {"calendar": calendar_events, "videos": todo_videos, "assignments": todo_assigns, "quizzes": todo_quizzes}
+        quiz_by_mid = {mid: (cid, act) for cid, mid, act in quiz_need_detail}
+        for module_id, detail in await _gather_bounded(fetch_quiz, list(quiz_by_mid)):
+            cid, act = quiz_by_mid[module_id]
+            act.extra.update(detail)
+            if detail.get("due_time"):
+                act.due_time = detail["due_time"]
+            emit(cid, act)
+
+    # Sort each course's (mostly chronological, so near-linear) run, then merge
+    # the K runs in O(n log K) instead of sorting everything at once.
+    def merged(kind, key):
+        runs = [sorted(lists[kind], key=key) for lists in per_course.values()]
+        return list(heapq.merge(*runs, key=key))
+
+    calendar_events = merged("calendar", itemgetter("start"))
+    todo_videos = merged("vod", itemgetter("due"))
+    todo_assigns = merged("assign", itemgetter("due"))
+    todo_quizzes = merged("quiz", itemgetter("due"))
+
+    return ORJSONResponse({"calendar": calendar_events, "videos": todo_videos, "assignments": todo_assigns, "quizzes": todo_quizzes})
 
 
 # Simple health/token validation endpoint
 @app.get("/ping")
-def ping(client: LearnUsClient = Depends(get_client)):
+async def ping(client: LearnUsClient = Depends(get_client)):
     return {"ok": True}
 
 
 # Logout: remove session & cache
 @app.post("/logout")
-def logout(x_auth_token: Optional[str] = Header(None)):
-    if not x_auth_token or x_auth_token not in _SESSIONS:
+async def logout(x_auth_token: Optional[str] = Header(None)):
+    with _SESSIONS_LOCK:
+        client = _SESSIONS.pop(x_auth_token, None) if x_auth_token else None
+    if client is None:
         raise HTTPException(status_code=401, detail="Invalid token")
-    client = _SESSIONS.pop(x_auth_token)
-    _COURSE_CACHE.pop(id(client), None)
+    with _COURSE_CACHE_LOCK:
+        _COURSE_CACHE.pop(client, None)
     return {"ok": True}
 
 
@@ -1,15 +1,36 @@
 from __future__ import annotations
 
+import functools
 import logging
-from typing import Tuple, Optional
+import time
+from typing import List, Tuple, Optional
 
+import orjson
 import requests
-from bs4 import BeautifulSoup
-from Crypto.PublicKey import RSA
-from Crypto.Cipher import PKCS1_v1_5
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+# Retry policy for LearnUs / SSO connections: a 502-504 from either host is
+# retried on the pooled connection instead of failing the whole login.
+LEARNUS_RETRY = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+
+# Filename-unsafe characters in video titles -> full-width look-alikes
+_TITLE_TRANS = str.maketrans('\\/:*?"<>|', "＼／：＊？＂＜＞｜")
+
+
+@functools.lru_cache(maxsize=4)
+def _rsa_cipher(km_hex: str):
+    """PKCS#1 v1.5 cipher for the SSO modulus (exponent 0x10001); the modulus rarely rotates."""
+    # PyCryptodome is only needed at login; importing it here keeps it off
+    # the startup path of every worker.
+    from Crypto.PublicKey import RSA
+    from Crypto.Cipher import PKCS1_v1_5
+
+    key = RSA.construct((int(km_hex, 16), 0x10001))
+    return PKCS1_v1_5.new(key)
+
 
 class LearnUsLoginError(Exception):
     """Raised when SSO login to LearnUs fails."""
@@ -26,10 +47,42 @@ class LearnUsClient:
     """
 
     BASE_URL = "https://ys.learnus.org"
-    _BASE_HEADERS = {"User-Agent": "Mozilla/5.0"}
 
-    def __init__(self) -> None:
+    # Static part of the spLoginData.php form (tokens/credentials are merged in per call)
+    _SSO_TOKEN_TEMPLATE = {
+        "app_id": "ednetYonsei",
+        "retUrl": BASE_URL,
+        "failUrl": f"{BASE_URL}/login/index.php",
+        "baseUrl": BASE_URL,
+        "loginUrl": f"{BASE_URL}/passni/sso/coursemosLogin.php",
+        "ssoGubun": "Login",
+        "refererUrl": BASE_URL,
+        "test": "SSOAuthLogin",
+    }
+    # Browser-like headers set once on every session (only Referer varies per step)
+    _SESSION_HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "ko-KR,ko;q=0.9,en;q=0.8",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Connection": "keep-alive",
+    }
+    # Seconds the dashboard course list is reused before being re-fetched
+    COURSES_TTL = 900
+
+    def __init__(self, adapter: Optional[HTTPAdapter] = None) -> None:
         self.session: Optional[requests.Session] = None
+        # Optional connection pool shared with other clients; cookies stay
+        # per-session, only the keep-alive sockets are reused.
+        self._adapter = adapter or HTTPAdapter(pool_maxsize=16, max_retries=LEARNUS_RETRY)
+        self._courses_cache: Optional[Tuple[float, List[dict]]] = None
+
+    def _make_session(self) -> requests.Session:
+        session = requests.Session()
+        session.headers.update(self._SESSION_HEADERS)
+        session.mount("https://", self._adapter)
+        session.mount("http://", self._adapter)
+        return session
 
     # ---------------------------------------------------------------------
     # Public helpers
@@ -44,17 +97,10 @@ class LearnUsClient:
         4. Encrypt credentials using RSA and submit to PmSSOAuthService
         5. Finalize with spLoginData.php and spLoginProcess.php
         """
-        import requests  # local import to be explicit
+        from bs4 import BeautifulSoup  # deferred: only login/video pages need it
         import re
 
-        session = requests.Session()
-        base_headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "ko-KR,ko;q=0.9,en;q=0.8",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive"
-        }
+        session = self._make_session()
 
         def post_request(url: str, headers: dict, data: dict):
             res = session.post(url, headers=headers, data=data)
@@ -62,12 +108,12 @@ class LearnUsClient:
             return res
 
         def get_value_from_input(res_text: str, input_name: str):
-            soup = BeautifulSoup(res_text, "html.parser")
+            soup = BeautifulSoup(res_text, "lxml")
             tag = soup.find("input", {"name": input_name})
             return tag["value"] if tag else None
 
         def get_multiple_values(res_text: str, names: list[str]):
-            soup = BeautifulSoup(res_text, "html.parser")
+            soup = BeautifulSoup(res_text, "lxml")
             values = {}
             for n in names:
                 tag = soup.find("input", {"name": n})
@@ -92,7 +138,7 @@ class LearnUsClient:
             return challenge_match.group(1), modulus_match.group(1)
 
         # Step 0: Establish proper session by visiting main page and login page
-        headers = base_headers.copy()
+        headers: dict = {}
         logger.info("[LearnUs] Establishing session...")
         
         # Visit main page first
@@ -130,16 +176,10 @@ class LearnUsClient:
             raise LearnUsLoginError("Failed to extract RSA keys from PmSSOService JavaScript")
         
         # Step 4: Encrypt credentials using RSA (same as before)
-        from Crypto.PublicKey import RSA
-        from Crypto.Cipher import PKCS1_v1_5
-        
-        key_pair = RSA.construct((int(key_modulus, 16), 0x10001))
-        cipher = PKCS1_v1_5.new(key_pair)
-        payload = f'{{"userid":"{username}","userpw":"{password}","ssoChallenge":"{sso_challenge}"}}'
-        e2 = cipher.encrypt(payload.encode()).hex()
+        e2 = self._encrypt_credentials(username, password, sso_challenge, key_modulus)
         
         # Extract form data from the login form
-        soup = BeautifulSoup(res.text, "html.parser")
+        soup = BeautifulSoup(res.content, "lxml")
         form = soup.find("form", {"action": "/sso/PmSSOAuthService"})
         if not form:
             raise LearnUsLoginError("PmSSOAuthService form not found in PmSSOService response")
@@ -170,18 +210,11 @@ class LearnUsClient:
         # Step 6: Finalize login with spLoginData.php
         headers["Referer"] = "https://infra.yonsei.ac.kr/"
         data = {
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
+            **self._SSO_TOKEN_TEMPLATE,
             "E3": e3,
             "E4": e4,
             "S2": s2,
             "CLTID": cltid,
-            "ssoGubun": "Login",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
             "username": username,
             "password": password,
         }
@@ -201,10 +234,12 @@ class LearnUsClient:
 
     def get_video_stream_info(self, video_page_url: str) -> Tuple[str, str]:
         """Return `(title, m3u8_url)` for a given LearnUs video page."""
+        from bs4 import BeautifulSoup
+
         session = self.ensure_logged_in()
         res = session.get(video_page_url)
         res.raise_for_status()
-        soup = BeautifulSoup(res.text, "html.parser")
+        soup = BeautifulSoup(res.content, "lxml")
 
         # Extract m3u8 source URL
         source_tag = soup.find("source", {"type": "application/x-mpegURL"})
@@ -219,21 +254,29 @@ class LearnUsClient:
         h1 = header_div.find("h1")
         for span in h1.find_all("span"):
             span.decompose()
-        title: str = h1.get_text(strip=True)
-        invalid_chars = '\\/:*?"<>|'
-        title = title.translate(str.maketrans(invalid_chars, "＼／：＊？＂＜＞｜"))
+        title: str = h1.get_text(strip=True).translate(_TITLE_TRANS)
 
         return title, m3u8_url
 
     def get_course_activities(self, course_id: int):
         """Fetch course page HTML and parse activities list using learnus_parser."""
+        return self.fetch_course_activities(course_id)[0]
+
+    def fetch_course_activities(self, course_id: int, etag: Optional[str] = None):
+        """Conditionally fetch a course page and return `(activities, etag)`.
+
+        If `etag` is given it is sent as `If-None-Match`; when the server answers
+        304 Not Modified, `activities` is None and the caller's copy is still valid.
+        """
         from learnus_parser import parse_course_activities  # local import to avoid circular
 
         session = self.ensure_logged_in()
         url = f"{self.BASE_URL}/course/view.php?id={course_id}"
-        res = session.get(url)
+        res = session.get(url, headers={"If-None-Match": etag} if etag else None)
+        if res.status_code == 304:
+            return None, etag
         res.raise_for_status()
-        return parse_course_activities(res.text)
+        return parse_course_activities(res.content), res.headers.get("ETag")
 
     def get_assignment_detail(self, assign_module_id: int):
         """Return dictionary with submission/due information for a given assignment module."""
@@ -243,7 +286,7 @@ class LearnUsClient:
         url = f"{self.BASE_URL}/mod/assign/view.php?id={assign_module_id}"
         res = session.get(url)
         res.raise_for_status()
-        return parse_assignment_detail(res.text)
+        return parse_assignment_detail(res.content)
 
     def get_quiz_detail(self, quiz_module_id: int):
         """Return dictionary with due time information for a given quiz module."""
@@ -256,151 +299,23 @@ class LearnUsClient:
         return parse_quiz_detail(res.text)
 
     def get_courses(self):
-        """Return list of courses as dicts {id, name}"""
+        """Return list of courses as dicts {id, name}, cached for `COURSES_TTL` seconds."""
         from learnus_parser import parse_dashboard_courses
 
+        if self._courses_cache is not None and time.time() - self._courses_cache[0] < self.COURSES_TTL:
+            return self._courses_cache[1]
+
         session = self.ensure_logged_in()
         res = session.get(f"{self.BASE_URL}/")
         res.raise_for_status()
-        return parse_dashboard_courses(res.text)
+        courses = parse_dashboard_courses(res.text)
+        self._courses_cache = (time.time(), courses)
+        return courses
 
     # ------------------------------------------------------------------
-    # Internal steps — closely mirror the original snippet
+    # Internal helpers
     # ------------------------------------------------------------------
-    def _post(self, url: str, headers: dict, data: dict):
-        res = self.session.post(url, headers=headers, data=data)
-        res.raise_for_status()
-        return res
-
-    def _get_input_value(self, res_text: str, name: str) -> Optional[str]:
-        soup = BeautifulSoup(res_text, "html.parser")
-        tag = soup.find("input", {"name": name})
-        return tag["value"] if tag else None
-
-    def _get_multiple_input_values(self, res_text: str, names: list[str]) -> Optional[dict[str, str]]:
-        soup = BeautifulSoup(res_text, "html.parser")
-        values = {}
-        for n in names:
-            tag = soup.find("input", {"name": n})
-            if tag is None:
-                return None
-            values[n] = tag["value"]
-        return values
-
-    # ----- Step helpers --------------------------------------------------
-    def _step_0_coursemos(self, username: str, password: str) -> str:
-        headers = {**self._BASE_HEADERS, "Referer": f"{self.BASE_URL}/login/method/sso.php"}
-        data = {
-            "ssoGubun": "Login",
-            "logintype": "sso",
-            "type": "popup_login",
-            "username": username,
-            "password": password,
-        }
-        res = self._post(f"{self.BASE_URL}/passni/sso/coursemosLogin.php", headers, data)
-        s1 = self._get_input_value(res.text, "S1")
-        if not s1:
-            raise LearnUsLoginError("Failed to obtain S1 in step 0 (possible credential error)")
-        return s1
-
-    def _step_1_get_challenge(self, username: str, password: str, s1: str) -> Tuple[str, str]:
-        headers = {**self._BASE_HEADERS, "Referer": f"{self.BASE_URL}/"}
-        data = {
-            "ssoGubun": "Login",
-            "logintype": "sso",
-            "type": "popup_login",
-            "username": username,
-            "password": password,
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "S1": s1,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
-            "loginType": "invokeID",
-            "E2": "",
-        }
-        res = self._post("https://infra.yonsei.ac.kr/sso/PmSSOService", headers, data)
-        vals = self._get_multiple_input_values(res.text, ["ssoChallenge", "keyModulus"])
-        if vals is None:
-            raise LearnUsLoginError("Failed to obtain ssoChallenge/keyModulus in step 1")
-        return vals["ssoChallenge"], vals["keyModulus"]
-
     def _encrypt_credentials(self, username: str, password: str, sc: str, km: str) -> str:
-        key_pair = RSA.construct((int(km, 16), 0x10001))
-        cipher = PKCS1_v1_5.new(key_pair)
-        payload = f'{{"userid":"{username}","userpw":"{password}","ssoChallenge":"{sc}"}}'
-        return cipher.encrypt(payload.encode()).hex()
-
-    def _step_2_submit_credentials(self, username: str, password: str, s1: str, sc: str, km: str, e2: str) -> str:
-        headers = {**self._BASE_HEADERS, "Referer": "https://infra.yonsei.ac.kr/"}
-        data = {
-            "ssoGubun": "Login",
-            "logintype": "sso",
-            "type": "popup_login",
-            "username": username,
-            "password": password,
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
-            "loginType": "invokeID",
-            "E2": e2,
-            "S1": s1,
-            "ssoChallenge": sc,
-            "keyModulus": km,
-            "keyExponent": "10001",
-        }
-        res = self._post(f"{self.BASE_URL}/passni/sso/coursemosLogin.php", headers, data)
-        s1 = self._get_input_value(res.text, "S1")
-        if not s1:
-            raise LearnUsLoginError("Failed to obtain S1 in step 2")
-        return s1
-
-    def _step_3_get_tokens(self, username: str, password: str, s1: str) -> Tuple[str, str, str, str]:
-        headers = {**self._BASE_HEADERS, "Referer": f"{self.BASE_URL}/"}
-        data = {
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
-            "S1": s1,
-            "ssoGubun": "Login",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
-            "username": username,
-            "password": password,
-        }
-        res = self._post("https://infra.yonsei.ac.kr/sso/PmSSOAuthService", headers, data)
-        vals = self._get_multiple_input_values(res.text, ["E3", "E4", "S2", "CLTID"])
-        if vals is None:
-            raise LearnUsLoginError("Failed to get E3/E4/S2/CLTID in step 3")
-        return vals["E3"], vals["E4"], vals["S2"], vals["CLTID"]
-
-    def _step_4_finalise(self, username: str, password: str, e3: str, e4: str, s2: str, cltid: str) -> None:
-        headers = {**self._BASE_HEADERS, "Referer": "https://infra.yonsei.ac.kr/"}
-        data = {
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
-            "E3": e3,
-            "E4": e4,
-            "S2": s2,
-            "CLTID": cltid,
-            "ssoGubun": "Login",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
-            "username": username,
-            "password": password,
-        }
-        self._post(f"{self.BASE_URL}/passni/sso/spLoginData.php", headers, data)
-        # Final GET to finish creating the session cookies.
-        self.session.get(f"{self.BASE_URL}/passni/spLoginProcess.php") 
\ No newline at end of file
+        # orjson escapes quotes/backslashes in credentials and emits bytes directly
+        payload = orjson.dumps({"userid": username, "userpw": password, "ssoChallenge": sc})
+        return _rsa_cipher(km).encrypt(payload).hex()
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import re
 import datetime as dt
+import functools
 from dataclasses import dataclass, field
+from html import unescape
 from typing import List, Optional
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 from zoneinfo import ZoneInfo
 
 __all__ = [
@@ -35,36 +38,76 @@ _DATE_RANGE_RE = re.compile(
 _ONLY_END_DATE_RE = re.compile(
     r"\s*~\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})",
 )
+# Trailing "(...)" section/code suffix on dashboard course names
+_COURSE_SUFFIX_RE = re.compile(r"\s*\([^)]*\)$")
 _LATE_RE = re.compile(r"Late\s*:\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
 
-# Accept both 'YYYY-MM-DD HH:MM:SS' and 'YYYY-MM-DD HH:MM'
-_DATETIME_PATTERNS = [
-    "%Y-%m-%d %H:%M:%S",
-    "%Y-%m-%d %H:%M",
-]
+# "종료일시 : 2025-09-27 23:59" etc. found directly in the raw quiz page HTML
+_QUIZ_DUE_RE = re.compile(
+    r"(?:종료일시|마감일시|Due date|End time|Closing time|Close date|Deadline)\s*:\s*"
+    r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}(?::\d{2})?)"
+)
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching elements whose class list contains `name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Course page selectors, compiled once instead of per call / per activity
+_ACTIVITY_XPATH = etree.XPath(f"//li[{_has_class('activity')}]")
+_INSTANCENAME_XPATH = etree.XPath(f".//span[{_has_class('instancename')}]")
+_TITLE_TEXT_XPATH = etree.XPath(
+    f".//text()[not(ancestor::span[{_has_class('accesshide')}])]", smart_strings=False
+)
+_COMPLETION_SRC_XPATH = etree.XPath(
+    f".//span[{_has_class('autocompletion')}]//img/@src", smart_strings=False
+)
+_DISPLAYOPTIONS_XPATH = etree.XPath(f".//span[{_has_class('displayoptions')}]")
+_TEXT_XPATH = etree.XPath(".//text()", smart_strings=False)
+
+# Assignment status table: rows holding both a label (c0) and a value (c1) cell
+_LABEL_CELL = f"td[{_has_class('cell')} and {_has_class('c0')}]"
+_VALUE_CELL = f"td[{_has_class('cell')} and {_has_class('c1')}]"
+_STATUS_ROW_XPATH = etree.XPath(f"//tr[.//{_LABEL_CELL} and .//{_VALUE_CELL}]")
+_LABEL_CELL_XPATH = etree.XPath(f"(.//{_LABEL_CELL})[1]")
+_VALUE_CELL_XPATH = etree.XPath(f"(.//{_VALUE_CELL})[1]")
+
+# Accept both 'YYYY-MM-DD HH:MM:SS' and 'YYYY-MM-DD HH:MM' in a single match;
+# like strptime, unpadded fields ('2025-9-7 3:05') are fine too.
+_DT_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{1,2})(?::(\d{1,2}))?")
+# LearnUs pages are UTF-8; parsing raw `res.content` bytes with the encoding
+# pinned also copes with pages that open with an <?xml encoding=...?> line.
+_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
 # Korea Standard Time
 KST = ZoneInfo("Asia/Seoul")
 
+@functools.lru_cache(maxsize=4096)
 def _parse_datetime(ts: str) -> dt.datetime:
-    for fmt in _DATETIME_PATTERNS:
-        try:
-            return dt.datetime.strptime(ts, fmt).replace(tzinfo=KST)
-        except ValueError:
-            continue
-    raise ValueError(f"Unrecognised datetime format: {ts}")
+    # Deadlines repeat a lot across activities; datetimes are immutable so the
+    # cached objects can be shared safely.
+    m = _DT_RE.fullmatch(ts)
+    if m is None:
+        raise ValueError(f"Unrecognised datetime format: {ts}")
+    y, mo, d, h, mi, sec = m.groups()
+    # Out-of-range fields still raise ValueError from the constructor
+    return dt.datetime(int(y), int(mo), int(d), int(h), int(mi), int(sec) if sec else 0, tzinfo=KST)
 
 
-def parse_course_activities(html: str) -> List[Activity]:
+def parse_course_activities(html: str | bytes) -> List[Activity]:
     """Parse LearnUs course page HTML and return list of Activity objects.
 
     Supports 'vod' (동영상) and 'assign' (과제) modules. Others are ignored for now.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    try:
+        root = lxml.html.document_fromstring(html, parser=_HTML_PARSER)
+    except etree.ParserError:  # empty document
+        return []
     activities: list[Activity] = []
     seen_ids: set[int] = set()
 
-    for li in soup.select("li.activity"):
-        classes = li.get("class", [])
+    for li in _ACTIVITY_XPATH(root):
+        classes = li.get("class", "").split()
         # Identify module ID
         module_id_str = li.get("id", "module-0").replace("module-", "")
         try:
@@ -86,46 +129,43 @@ def parse_course_activities(html: str) -> List[Activity]:
             continue  # skip unsupported types for now
 
         # Title inside span.instancename (without nested span.accesshide)
-        span_name = li.select_one("span.instancename")
+        span_name = _INSTANCENAME_XPATH(li)
         if not span_name:
             continue
-        
-        # Remove any child with class accesshide
-        accesshide = span_name.select_one("span.accesshide")
-        if accesshide:
-            accesshide.decompose()
-        title = span_name.get_text(strip=True)
+        title = "".join(t.strip() for t in _TITLE_TEXT_XPATH(span_name[0]))
         # Remove trailing '동영상' or '과제' word that came from accesshide span
         # title = re.sub(r"\s*(동영상|과제)$", "", title)
 
         # Completion status: check for <img ... src="...completion-auto-y.svg"> existing inside .autocompletion
         completed = False
-        comp_img = li.select_one("span.autocompletion img")
-        if comp_img and comp_img.has_attr("src"):
-            if "completion-auto-y" in comp_img["src"]:
-                completed = True
+        comp_src = _COMPLETION_SRC_XPATH(li)
+        if comp_src and "completion-auto-y" in comp_src[0]:
+            completed = True
 
         open_time = None
         due_time = None
         late_due_time = None
 
         # Parse date range text if available (vod items have it)
-        display_text = li.select_one("span.displayoptions")
+        display_text = _DISPLAYOPTIONS_XPATH(li)
         if display_text:
-            text = display_text.get_text(" ", strip=True)
-            m = _DATE_RANGE_RE.search(text)
-            if m:
-                open_time = _parse_datetime(m.group(1))
-                due_time = _parse_datetime(m.group(2))
-            else:
-                # Check for end date only format (~ END_TIME)
-                end_only_m = _ONLY_END_DATE_RE.search(text)
-                if end_only_m:
-                    open_time = None
-                    due_time = _parse_datetime(end_only_m.group(1))
-            late_m = _LATE_RE.search(text)
-            if late_m:
-                late_due_time = _parse_datetime(late_m.group(1))
+            text = " ".join(t for t in (s.strip() for s in _TEXT_XPATH(display_text[0])) if t)
+            # Cheap substring checks first; most items carry no dates at all
+            if "~" in text:
+                m = _DATE_RANGE_RE.search(text)
+                if m:
+                    open_time = _parse_datetime(m.group(1))
+                    due_time = _parse_datetime(m.group(2))
+                else:
+                    # Check for end date only format (~ END_TIME)
+                    end_only_m = _ONLY_END_DATE_RE.search(text)
+                    if end_only_m:
+                        open_time = None
+                        due_time = _parse_datetime(end_only_m.group(1))
+            if "Late" in text:
+                late_m = _LATE_RE.search(text)
+                if late_m:
+                    late_due_time = _parse_datetime(late_m.group(1))
 
         activities.append(
             Activity(
@@ -142,7 +182,43 @@ def parse_course_activities(html: str) -> List[Activity]:
     return activities
 
 
-def parse_assignment_detail(html: str) -> dict:
+# Exact status values meaning "submitted" ('미완료' must not count)
+_SUBMITTED_VALUES = {"제출 완료", "Submitted for grading"}
+
+
+def _set_submission(info: dict, value: str) -> None:
+    info["submission_status"] = value
+    info["submitted"] = value in _SUBMITTED_VALUES
+
+
+def _set_grading(info: dict, value: str) -> None:
+    info["grading_status"] = value
+
+
+def _set_due(info: dict, value: str) -> None:
+    try:
+        info["due_time"] = _parse_datetime(value)
+    except ValueError:
+        pass
+
+
+# Row label -> setter for the matching info field (Korean and English UI);
+# other rows are ignored
+_ASSIGN_FIELD_SETTERS = {
+    "제출 여부": _set_submission,
+    "Submission status": _set_submission,
+    "채점 상황": _set_grading,
+    "Grading status": _set_grading,
+    "종료 일시": _set_due,
+    "Due date": _set_due,
+}
+
+
+def _cell_text(td) -> str:
+    return "".join(t.strip() for t in td.itertext())
+
+
+def parse_assignment_detail(html: str | bytes) -> dict:
     """Parse LearnUs assignment detail page and extract submission + due info.
 
     Returns
@@ -153,7 +229,6 @@ def parse_assignment_detail(html: str) -> dict:
         grading_status : str | None
         due_time : datetime | None
     """
-    soup = BeautifulSoup(html, "html.parser")
     info = {
         "submitted": None,
         "submission_status": None,
@@ -161,26 +236,14 @@ def parse_assignment_detail(html: str) -> dict:
         "due_time": None,
     }
 
-    for tr in soup.select("tr"):
-        label_td = tr.select_one("td.cell.c0")
-        value_td = tr.select_one("td.cell.c1")
-        if not label_td or not value_td:
-            continue
-        label = label_td.get_text(strip=True)
-        value = value_td.get_text(strip=True)
-        if label == "제출 여부":
-            info["submission_status"] = value
-            info["submitted"] = value == "제출 완료"
-        elif label == "Submission status":
-            info["submission_status"] = value
-            info["submitted"] = value == "Submitted for grading"
-        elif label == "채점 상황" or label == "Grading status":
-            info["grading_status"] = value
-        elif label == "종료 일시" or label == "Due date":
-            try:
-                info["due_time"] = _parse_datetime(value)
-            except ValueError:
-                pass
+    try:
+        root = lxml.html.document_fromstring(html, parser=_HTML_PARSER)
+    except etree.ParserError:  # empty document
+        return info
+    for tr in _STATUS_ROW_XPATH(root):
+        setter = _ASSIGN_FIELD_SETTERS.get(_cell_text(_LABEL_CELL_XPATH(tr)[0]))
+        if setter is not None:
+            setter(info, _cell_text(_VALUE_CELL_XPATH(tr)[0]))
 
     return info
 
@@ -193,11 +256,24 @@ def parse_quiz_detail(html: str) -> dict:
     dict with keys:
         due_time : datetime | None
     """
-    soup = BeautifulSoup(html, "html.parser")
     info = {
         "due_time": None,
     }
 
+    # Fast path: the due line is usually plain text, so a regex over the raw
+    # HTML finds it without building a DOM.
+    m = _QUIZ_DUE_RE.search(html)
+    if m:
+        try:
+            info["due_time"] = _parse_datetime(m.group(1))
+            return info
+        except ValueError:
+            pass
+
+    from bs4 import BeautifulSoup  # only reached when the regex misses
+
+    soup = BeautifulSoup(html, "lxml")
+
     # Look for due time patterns in both Korean and English
     # Common patterns: "종료일시 : YYYY-MM-DD HH:MM", "Due date : YYYY-MM-DD HH:MM", etc.
     due_time_keywords = [
@@ -235,9 +311,33 @@ def parse_quiz_detail(html: str) -> dict:
     return info
 
 
+# Course <option>s inside the dashboard's activity-course <select>
+_COURSE_SELECT_MARK = "form-control-my-activity-course"
+_COURSE_OPT_RE = re.compile(r"""<option[^>]*\svalue=["']\s*(\d+)\s*["'][^>]*>([^<]*)</option>""", re.I)
+
+
 def parse_dashboard_courses(html: str) -> List[dict]:
-    """Parse main dashboard page and return list of courses with `id`, `name`."""
-    soup = BeautifulSoup(html, "html.parser")
+    """Parse main dashboard page and return list of courses with `id`, `name`, `short_name`.
+
+    `short_name` is `name` without its trailing parenthesised suffix.
+    """
+    # Fast path: regex over just the <select> region, no DOM at all
+    start = html.find(_COURSE_SELECT_MARK)
+    if start == -1:
+        return []
+    end = html.find("</select>", start)
+    if end != -1:
+        courses = []
+        for value, text in _COURSE_OPT_RE.findall(html, start, end):
+            name = unescape(text).strip()
+            courses.append({"id": int(value), "name": name, "short_name": _COURSE_SUFFIX_RE.sub("", name)})
+        if courses:
+            return courses
+
+    # Unexpected markup: fall back to a full parse
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "lxml")
     courses = []
     select = soup.select_one("select.form-control-my-activity-course")
     if not select:
@@ -246,5 +346,6 @@ def parse_dashboard_courses(html: str) -> List[dict]:
         value = opt.get("value", "").strip()
         if not value.isdigit():
             continue
-        courses.append({"id": int(value), "name": opt.get_text(strip=True)})
+        name = opt.get_text(strip=True)
+        courses.append({"id": int(value), "name": name, "short_name": _COURSE_SUFFIX_RE.sub("", name)})
     return courses 
\ No newline at end of file
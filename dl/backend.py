@@ -1,22 +1,67 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import os
+import pathlib
+import re
+import shutil
+import subprocess
+import tempfile
+import time
 import uuid
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from html import unescape
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
-from fastapi import FastAPI, HTTPException, Depends, Header, status, UploadFile, File, Query, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Depends, Header, status, UploadFile, File, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from cachetools import TTLCache
 
 from learnus_client import LearnUsClient, LearnUsLoginError
 
-app = FastAPI(title="LearnUs Downloader API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail at boot rather than on the first download
+    if not FFMPEG_BIN:
+        raise RuntimeError("ffmpeg executable not found on server. Install ffmpeg and ensure it is in PATH.")
+    purger = asyncio.ensure_future(_purge_jobs_periodically())
+    yield
+    purger.cancel()
+    # Stop pending remux jobs and delete their files
+    for job_id, job in list(_JOBS.items()):
+        job["task"].cancel()
+        _remove_job(job_id)
+    MEDIA_POOL.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="LearnUs Downloader API", default_response_class=ORJSONResponse, lifespan=lifespan)
 
-# Session store now may contain either a LearnUsClient (for normal users) or None (for guest users).
-_SESSIONS: Dict[str, Optional[LearnUsClient]] = {}
+# Session store {token: (client, expires_at)}; client is a LearnUsClient for
+# normal users or None for guest users.  expires_at is on the monotonic clock.
+_SESSIONS: Dict[str, Tuple[Optional[LearnUsClient], float]] = {}
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(6 * 3600)))
+GUEST_SESSION_TTL = int(os.getenv("GUEST_SESSION_TTL", "3600"))
+# Expired sessions are swept at most this often (seconds); lookups check expiry themselves
+_PURGE_INTERVAL = 60
+_last_purge = 0.0
 
-# Course cache {client_id: {course_id: (last_access_time, activities)}}
-_COURSE_CACHE: Dict[int, Dict[int, Tuple[float, List]]] = {}
+# Course cache {token: {course_id: activities}}; per-session LRU with 15 min expiry.
+# Only touched from the event loop, so no lock is needed.
+_COURSE_CACHE: Dict[str, TTLCache] = {}
+
+# In-flight course fetches so concurrent misses for the same key share one request
+_INFLIGHT: Dict[Tuple[str, int], asyncio.Task] = {}
 
 
 class LoginRequest(BaseModel):
@@ -40,54 +85,106 @@ class GuestLoginResponse(BaseModel):
 # does NOT attach a LearnUsClient instance to the session store.
 
 @app.post("/guest_login", response_model=GuestLoginResponse, summary="비회원 로그인")
-def guest_login():
+async def guest_login():
     token = uuid.uuid4().hex
     # Store a sentinel (None) so that token validation can still succeed while
     # allowing us to distinguish guest sessions from normal ones.
-    _SESSIONS[token] = None
+    _store_session(token, None, GUEST_SESSION_TTL)
     return {"token": token}
 
 
 # -------------------------------- Utils ---------------------------------
 
-def get_client(x_auth_token: Optional[str] = Header(None)) -> LearnUsClient:
-    if not x_auth_token or x_auth_token not in _SESSIONS:
+def _drop_session(token: str) -> None:
+    _SESSIONS.pop(token, None)
+    _COURSE_CACHE.pop(token, None)
+
+
+def _purge_expired() -> None:
+    """Drop expired sessions; rate-limited so most calls return immediately."""
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < _PURGE_INTERVAL:
+        return
+    _last_purge = now
+    for token, (_, expires_at) in list(_SESSIONS.items()):
+        if expires_at < now:
+            _drop_session(token)
+
+
+def _store_session(token: str, client: Optional[LearnUsClient], ttl: int) -> None:
+    _purge_expired()
+    _SESSIONS[token] = (client, time.monotonic() + ttl)
+
+
+def _live_session(token: Optional[str]) -> Optional[Tuple[Optional[LearnUsClient], float]]:
+    """Return the (client, expires_at) entry for a valid, unexpired token, else None."""
+    entry = _SESSIONS.get(token) if token else None
+    if entry is not None and entry[1] < time.monotonic():
+        _drop_session(token)
+        return None
+    return entry
+
+
+async def get_client(x_auth_token: Optional[str] = Header(None)) -> LearnUsClient:
+    # async so session lookups (and expiry drops) stay on the event loop
+    entry = _live_session(x_auth_token)
+    if entry is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing token")
-    return _SESSIONS[x_auth_token]
+    return entry[0]
 
 
-def _get_course_activities_cached(client: LearnUsClient, course_id: int, ttl: int = 900):
-    """Return activities from cache if still fresh; otherwise fetch and update cache."""
-    import time
+async def get_session(x_auth_token: Optional[str] = Header(None)) -> Tuple[LearnUsClient, str]:
+    """Like get_client, but also return the token (used as the cache key)."""
+    return await get_client(x_auth_token), x_auth_token
 
-    cache = _COURSE_CACHE.setdefault(id(client), {})
-    if course_id in cache and time.time() - cache[course_id][0] < ttl:
-        return cache[course_id][1]
 
-    activities = client.get_course_activities(course_id)
-    cache[course_id] = (time.time(), activities)
-    return activities
+async def _get_course_activities_cached(client: LearnUsClient, token: str, course_id: int):
+    """Return activities from cache if still fresh; otherwise fetch and update cache.
+
+    Concurrent misses for the same (token, course) await a single fetch.
+    """
+    cache = _COURSE_CACHE.get(token)
+    if cache is not None and course_id in cache:
+        return cache[course_id]
+
+    key = (token, course_id)
+    task = _INFLIGHT.get(key)
+    if task is None:
+        async def _fetch():
+            activities = await asyncio.to_thread(client.get_course_activities, course_id)
+            if token in _SESSIONS:  # don't resurrect the cache of a logged-out session
+                if token not in _COURSE_CACHE:
+                    _COURSE_CACHE[token] = TTLCache(maxsize=256, ttl=900)
+                _COURSE_CACHE[token][course_id] = activities
+            return activities
+
+        task = asyncio.ensure_future(_fetch())
+        _INFLIGHT[key] = task
+        task.add_done_callback(lambda _t: _INFLIGHT.pop(key, None))
+    # shield: a cancelled request must not cancel the fetch other callers await
+    return await asyncio.shield(task)
 
 
 # -------------------------------- Routes --------------------------------
 
 @app.post("/login", response_model=LoginResponse)
-def login(payload: LoginRequest):
+async def login(payload: LoginRequest):
     client = LearnUsClient()
     try:
-        client.login(payload.username, payload.password)
+        await client.login_async(payload.username, payload.password)
     except LearnUsLoginError:
         raise HTTPException(status_code=400, detail="로그인에 실패했습니다. 학번/비밀번호를 확인해주세요.")
     except Exception:
         raise HTTPException(status_code=400, detail="로그인 중 알 수 없는 오류가 발생했습니다.")
     token = uuid.uuid4().hex
-    _SESSIONS[token] = client
+    _store_session(token, client, SESSION_TTL)
     return {"token": token}
 
 
 @app.get("/courses")
 def get_courses(client: LearnUsClient = Depends(get_client)):
-    return client.get_courses()
+    return ORJSONResponse(client.get_courses())
 
 
 # Simple health/token validation endpoint
@@ -98,49 +195,201 @@ def ping(client: LearnUsClient = Depends(get_client)):
 
 # Logout: remove session & cache
 @app.post("/logout")
-def logout(x_auth_token: Optional[str] = Header(None)):
-    if not x_auth_token or x_auth_token not in _SESSIONS:
+async def logout(x_auth_token: Optional[str] = Header(None)):
+    if _live_session(x_auth_token) is None:
         raise HTTPException(status_code=401, detail="Invalid token")
-    client = _SESSIONS.pop(x_auth_token)
-    _COURSE_CACHE.pop(id(client), None)
+    _drop_session(x_auth_token)
     return {"ok": True}
 
 
 # ----------------------------- Static files -----------------------------
 # Serve simple frontend (static/index.html etc.) under /
-import pathlib
-
-
 # (mount is added *after* all API routes to ensure they take lower precedence)
 
 # -------------------------------- New Video Endpoints --------------------------------
 
-import subprocess, tempfile
-import shlex
-from urllib.parse import quote
-import shutil, os
+# Resolved once at import; FFMPEG_PATH / FFPROBE_PATH override the PATH lookup
+FFMPEG_BIN = os.getenv("FFMPEG_PATH") or shutil.which("ffmpeg") or shutil.which("ffmpeg.exe")
+FFPROBE_BIN = os.getenv("FFPROBE_PATH") or shutil.which("ffprobe") or shutil.which("ffprobe.exe")
+
+# ffprobe results {video_id | url digest: (duration, bitrate)}; static per VOD
+_PROBE_CACHE: TTLCache = TTLCache(maxsize=2048, ttl=86400)
+
+# ffmpeg stdout is read in 1 MiB chunks straight from the pipe fd
+_PIPE_CHUNK = 1 << 20
+
+# Dedicated threads for blocking ffmpeg pipe reads / reaping, so long downloads
+# cannot starve the default executor used by the LearnUs HTTP calls
+MEDIA_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("MEDIA_POOL_SIZE", "32")), thread_name_prefix="media")
+
+
+def _grow_pipe(fd: int) -> None:
+    """Best-effort enlarge of the kernel pipe buffer (Linux only)."""
+    if fcntl is None:
+        return
+    try:
+        fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, _PIPE_CHUNK)
+    except (AttributeError, OSError):
+        pass
+
+
+def _reap(process: subprocess.Popen) -> None:
+    """Give ffmpeg a moment to exit after SIGTERM, then SIGKILL it."""
+    try:
+        process.wait(timeout=2)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    process.stdout.close()
+
+
+async def _iter_process(process: subprocess.Popen, request: Request):
+    """Yield ffmpeg stdout until EOF or client disconnect, then stop ffmpeg."""
+    loop = asyncio.get_running_loop()
+    fd = process.stdout.fileno()
+    _grow_pipe(fd)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(MEDIA_POOL, os.read, fd, _PIPE_CHUNK)
+            if not chunk or await request.is_disconnected():
+                break
+            yield chunk
+    finally:
+        # Not awaited: this also runs when the response task is cancelled
+        process.terminate()
+        loop.run_in_executor(MEDIA_POOL, _reap, process)
+
+
+async def _probe_cached(key, m3u8_url: str) -> Tuple[Optional[float], Optional[int]]:
+    """_probe() memoised in _PROBE_CACHE; failed probes are not cached."""
+    cached = _PROBE_CACHE.get(key)
+    if cached is not None:
+        return cached
+    if not FFPROBE_BIN:
+        return None, None
+    result = await _probe(m3u8_url, FFPROBE_BIN)
+    if result[0] is not None:
+        _PROBE_CACHE[key] = result
+    return result
+
+
+async def _probe(m3u8_url: str, ffprobe_bin: str) -> Tuple[Optional[float], Optional[int]]:
+    """Return (duration seconds, bitrate bps) of the stream via ffprobe, or Nones."""
+    duration: Optional[float] = None
+    bitrate: Optional[int] = None
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            ffprobe_bin,
+            "-v", "error",
+            "-show_entries", "format=duration,bit_rate",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            m3u8_url,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+    except Exception:
+        return None, None
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=10)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return None, None
+    if proc.returncode != 0:
+        return None, None
+
+    lines = [l.strip() for l in stdout.decode(errors="ignore").splitlines() if l.strip()]
+    if lines:
+        try:
+            duration = float(lines[0])
+        except ValueError:
+            pass
+        if len(lines) > 1:
+            try:
+                bitrate = int(lines[1])  # bits/sec
+            except ValueError:
+                pass
+    return duration, bitrate
+
+
+async def _stream_media(m3u8_url: str, title: str, ext: str, request: Request, probe_key) -> StreamingResponse:
+    """Convert the HLS stream with ffmpeg and stream it back as MP4 or MP3.
+
+    Shared by /download and /guest/download; probe_key identifies the VOD in
+    _PROBE_CACHE.
+    """
+    stream_duration, stream_bitrate = await _probe_cached(probe_key, m3u8_url)
+
+    filename = f"{title}.{ext}"
+    headers = {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"}
+    if stream_duration:
+        headers["X-Stream-Duration"] = str(stream_duration)
+    if stream_bitrate:
+        headers["X-Stream-Bitrate"] = str(stream_bitrate)
+
+    if ext == "mp4":
+        # ------------------------------------------------------------------
+        # Fragmented MP4 (empty moov + per-keyframe fragments) does not need a
+        # seekable output, so ffmpeg can write straight to the pipe and the
+        # client starts receiving data after the first fragment.
+        # ------------------------------------------------------------------
+        cmd = [
+            FFMPEG_BIN,
+            "-loglevel", "error",
+            "-i", m3u8_url,
+            "-c", "copy",
+            "-bsf:a", "aac_adtstoasc",
+            "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+            "-f", "mp4",
+            "pipe:1",
+        ]
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=_PIPE_CHUNK)
+        if process.stdout is None:
+            raise HTTPException(status_code=500, detail="Failed to initiate ffmpeg stream")
+
+        return StreamingResponse(_iter_process(process, request), media_type="video/mp4", headers=headers)
+
+    # -------------------------------- MP3 (streaming) -------------------------------
+    cmd = [
+        FFMPEG_BIN,
+        "-loglevel", "error",
+        "-y",
+        "-i", m3u8_url,
+        "-vn",
+        "-c:a", "libmp3lame",
+        "-b:a", "192k",
+        "-f", "mp3",
+        "pipe:1",
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=_PIPE_CHUNK)
+    if process.stdout is None:
+        raise HTTPException(status_code=500, detail="Failed to initiate ffmpeg stream")
+
+    return StreamingResponse(_iter_process(process, request), media_type="audio/mpeg", headers=headers)
+
 
 @app.get("/videos")
-def list_videos(course_id: int, client: LearnUsClient = Depends(get_client)):
+async def list_videos(course_id: int, session: Tuple[LearnUsClient, str] = Depends(get_session)):
     """Return list of VOD (video) activities for the given course."""
-    activities = _get_course_activities_cached(client, course_id)
+    client, token = session
+    activities = await _get_course_activities_cached(client, token, course_id)
     videos = [
         {
             "id": a.id,
             "title": a.title,
             "completed": a.completed,
-            "open": a.open_time.isoformat() if a.open_time else None,
-            "due": a.due_time.isoformat() if a.due_time else None,
+            "open": a.open_time,
+            "due": a.due_time,
             "available": a.extra.get("playable", True),
         }
         for a in activities
         if a.type == "vod"
     ]
-    return {"videos": videos}
+    return ORJSONResponse({"videos": videos})
 
 
 @app.get("/download/{video_id}.{ext}")
-def download_video(video_id: int, ext: str, client: LearnUsClient = Depends(get_client)):
+async def download_video(video_id: int, ext: str, request: Request, client: LearnUsClient = Depends(get_client)):
     """Stream MP4/MP3 conversion of the given video module to the user.
 
     ext must be "mp4" or "mp3".
@@ -150,121 +399,183 @@ def download_video(video_id: int, ext: str, client: LearnUsClient = Depends(get_
 
     video_page_url = f"{client.BASE_URL}/mod/vod/viewer.php?id={video_id}"
     try:
-        title, m3u8_url = client.get_video_stream_info(video_page_url)
+        title, m3u8_url = await asyncio.to_thread(client.get_video_stream_info, video_page_url)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # Probe duration (in seconds) using ffprobe, if available
-    ffprobe_bin = os.getenv("FFPROBE_PATH") or shutil.which("ffprobe") or shutil.which("ffprobe.exe")
-    stream_duration: Optional[float] = None
-    stream_bitrate: Optional[int] = None  # bits per second
-    if ffprobe_bin:
-        try:
-            probe_cmd = [
-                ffprobe_bin,
-                "-v", "error",
-                "-show_entries", "format=duration,bit_rate",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                m3u8_url,
-            ]
-            result = subprocess.run(probe_cmd, capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                lines = [l.strip() for l in result.stdout.splitlines() if l.strip()]
-                if lines:
-                    try:
-                        stream_duration = float(lines[0])
-                    except ValueError:
-                        pass
-                    if len(lines) > 1:
-                        try:
-                            stream_bitrate = int(lines[1])  # bits/sec
-                        except ValueError:
-                            pass
-        except Exception:
-            # ignore probe errors
-            stream_duration = None
-            stream_bitrate = None
+    return await _stream_media(m3u8_url, title, ext, request, probe_key=video_id)
 
-    # Prepare ffmpeg command
-    ffmpeg_bin = os.getenv("FFMPEG_PATH") or shutil.which("ffmpeg") or shutil.which("ffmpeg.exe")
-    if not ffmpeg_bin:
-        raise HTTPException(status_code=500, detail="ffmpeg executable not found on server. Install ffmpeg and ensure it is in PATH.")
 
-    filename = f"{title}.{ext}"
-    headers = {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"}
-    if stream_duration:
-        headers["X-Stream-Duration"] = str(stream_duration)
-    if stream_bitrate:
-        headers["X-Stream-Bitrate"] = str(stream_bitrate)
+# ---------------------------- MP4 remux jobs ----------------------------
+# Long VODs can be remuxed to a regular (+faststart) MP4 on disk in the
+# background instead of holding a streaming connection open: the client posts a
+# job, polls its status and downloads the finished file.  Jobs live in process
+# memory, like sessions.
 
-    if ext == "mp4":
-        # ------------------------------------------------------------------
-        # For MP4 we first remux into a temporary file so that ffmpeg can write
-        # a proper, self-contained MP4 (moov atom relocated with +faststart).
-        # Writing directly to a pipe is not possible because the MP4 muxer
-        # requires a seekable output when not using fragmented mode.
-        # ------------------------------------------------------------------
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-            tmp_path = tmp.name
+_JOBS: Dict[str, dict] = {}
+_JOB_TTL = 3600  # finished jobs (and their files) are dropped after an hour
+_REMUX_SLOTS = asyncio.Semaphore(int(os.getenv("REMUX_CONCURRENCY", "4")))
 
-        remux_cmd = [
-            ffmpeg_bin,
-            "-loglevel", "error",
-            "-y",
-            "-i", m3u8_url,
-            "-c", "copy",
-            "-bsf:a", "aac_adtstoasc",
-            "-movflags", "+faststart",
-            tmp_path,
-        ]
 
-        result = subprocess.run(remux_cmd, capture_output=True)
-        if result.returncode != 0:
-            # Clean up temp file on error
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
-            raise HTTPException(status_code=500, detail="ffmpeg failed to remux video")
+class _LargeChunkFileResponse(FileResponse):
+    chunk_size = 1 << 20
 
-        # Use BackgroundTasks to delete the temporary file after the response is sent
-        def _cleanup():
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
 
-        background_tasks = BackgroundTasks()
-        background_tasks.add_task(_cleanup)
+def _remove_job(job_id: str) -> None:
+    job = _JOBS.pop(job_id, None)
+    if job is not None:
+        try:
+            os.remove(job["path"])
+        except OSError:
+            pass
 
-        return FileResponse(tmp_path, media_type="video/mp4", filename=filename, headers=headers, background=background_tasks)
 
-    # -------------------------------- MP3 (streaming) -------------------------------
-    codec_args = "-vn -c:a libmp3lame -b:a 192k -f mp3"
-    cmd = f"{shlex.quote(ffmpeg_bin)} -loglevel error -y -i {shlex.quote(m3u8_url)} {codec_args} pipe:1"
+def _purge_jobs() -> None:
+    now = time.time()
+    for job_id, job in list(_JOBS.items()):
+        if job["state"] in {"SUCCESS", "FAILURE"} and now - job["finished"] > _JOB_TTL:
+            _remove_job(job_id)
+
+
+async def _purge_jobs_periodically() -> None:
+    # Finished files nobody fetches must not wait for the next job to expire
+    while True:
+        await asyncio.sleep(_JOB_TTL / 4)
+        _purge_jobs()
 
-    process = subprocess.Popen(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if process.stdout is None:
-        raise HTTPException(status_code=500, detail="Failed to initiate ffmpeg stream")
 
-    def iterfile():
+async def _run_remux_job(job: dict, m3u8_url: str) -> None:
+    async with _REMUX_SLOTS:
+        job["state"] = "RUNNING"
+        returncode = None
         try:
-            while True:
-                chunk = process.stdout.read(1024 * 1024)
-                if not chunk:
-                    break
-                yield chunk
+            proc = await asyncio.create_subprocess_exec(
+                FFMPEG_BIN,
+                "-loglevel", "error",
+                "-y",
+                "-i", m3u8_url,
+                "-c", "copy",
+                "-bsf:a", "aac_adtstoasc",
+                "-movflags", "+faststart",
+                job["path"],
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            try:
+                returncode = await proc.wait()
+            except asyncio.CancelledError:
+                proc.kill()
+                await proc.wait()  # reap it so no zombie is left behind
+                raise
+        except Exception:
+            pass  # ffmpeg missing, EMFILE/ENOMEM, ...: reported as FAILURE below
         finally:
-            process.stdout.close()
-            process.kill()
+            # Also reached on cancellation, so the job never stays RUNNING and
+            # _purge_jobs can collect it
+            job["state"] = "SUCCESS" if returncode == 0 else "FAILURE"
+            job["finished"] = time.time()
+            if returncode != 0:
+                try:
+                    os.remove(job["path"])
+                except OSError:
+                    pass
+
+
+def _get_job(job_id: str, token: str) -> dict:
+    _purge_jobs()  # expire unfetched files even when no new jobs are created
+    job = _JOBS.get(job_id)
+    if job is None or job["token"] != token:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@app.post("/download/{video_id}/job")
+async def create_remux_job(video_id: int, session: Tuple[LearnUsClient, str] = Depends(get_session)):
+    """Start remuxing the given video to MP4 in the background; returns a job id."""
+    client, token = session
+    if client is None:  # guest sessions have no LearnUs login to fetch the page with
+        raise HTTPException(status_code=400, detail="Guest sessions cannot start remux jobs")
+    video_page_url = f"{client.BASE_URL}/mod/vod/viewer.php?id={video_id}"
+    try:
+        title, m3u8_url = await asyncio.to_thread(client.get_video_stream_info, video_page_url)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return StreamingResponse(iterfile(), media_type="audio/mpeg", headers=headers)
+    _purge_jobs()
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    job_id = uuid.uuid4().hex
+    job = {"state": "PENDING", "token": token, "path": path, "filename": f"{title}.mp4", "finished": 0.0}
+    job["task"] = asyncio.ensure_future(_run_remux_job(job, m3u8_url))
+    _JOBS[job_id] = job
+    return {"job_id": job_id}
+
+
+@app.get("/download/{job_id}/status")
+async def remux_job_status(job_id: str, session: Tuple[LearnUsClient, str] = Depends(get_session)):
+    job = _get_job(job_id, session[1])
+    return {"state": job["state"]}
+
+
+@app.get("/download/{job_id}/file")
+async def remux_job_file(job_id: str, session: Tuple[LearnUsClient, str] = Depends(get_session)):
+    """Return the finished MP4; the file is deleted once it has been sent."""
+    job = _get_job(job_id, session[1])
+    if job["state"] != "SUCCESS":
+        raise HTTPException(status_code=409, detail=f"Job is {job['state']}")
+    return _LargeChunkFileResponse(
+        job["path"],
+        media_type="video/mp4",
+        filename=job["filename"],
+        stat_result=os.stat(job["path"]),
+        background=BackgroundTask(_remove_job, job_id),
+    )
 
 
 # --------------------------- Guest download via HTML ---------------------------
 
+# Targeted patterns for the LearnUs viewer page (src/type may appear in any order)
+_M3U8_RE = re.compile(
+    rb'<source\b(?=[^>]*\btype=["\']application/x-mpegURL["\'])[^>]*?\bsrc=["\']([^"\']+)["\']',
+    re.I,
+)
+# The title is the first <h1> after the vod_header <div> opens; the two are
+# located separately so the gap between them can span any number of chunks
+_VOD_HEADER_RE = re.compile(rb'<div[^>]+id=["\']vod_header["\'][^>]*>', re.I)
+_H1_RE = re.compile(rb'<h1[^>]*>(.*?)</h1>', re.I | re.S)
+_DIV_TAG_RE = re.compile(rb'<(/?)div\b', re.I)
+_SPAN_RE = re.compile(rb'<span\b.*?</span>', re.I | re.S)
+_TAG_RE = re.compile(rb'<[^>]+>')
+_UPLOAD_CHUNK = 64 * 1024
+# Bytes of already-scanned data searched again with each new chunk, so a
+# match cut by a chunk boundary is still found without rescanning the buffer
+_SCAN_OVERLAP = 8 * 1024
+
+# Characters not allowed in file names -> full-width look-alikes
+_INVALID_FNAME = "\\/:*?\"<>|"
+_INVALID_FNAME_REPL = '＼／：＊？＂＜＞｜'
+_TITLE_TRANS = str.maketrans(_INVALID_FNAME, _INVALID_FNAME_REPL)
+
+
+def _inside_header(buf: bytearray, start: int, end: int) -> bool:
+    """True if the vod_header <div> opened at `start` is still open at `end`."""
+    depth = 1
+    for m in _DIV_TAG_RE.finditer(buf, start, end):
+        depth += -1 if m.group(1) else 1
+        if depth == 0:
+            return False
+    return True
+
+
+def _h1_text(inner: bytes) -> str:
+    """Mirror h1.get_text(strip=True) after dropping <span> children."""
+    parts = _TAG_RE.split(_SPAN_RE.sub(b"<span>", inner))
+    return "".join(unescape(p.decode("utf-8", errors="ignore")).strip() for p in parts)
+
+
 @app.post("/guest/download")
 async def guest_download(
+    request: Request,
     ext: str = Query(..., regex="^(mp4|mp3)$", description="Download type: mp4 or mp3"),
     file: UploadFile = File(..., description="HTML page containing .m3u8 URL"),
     x_auth_token: Optional[str] = Header(None),
@@ -278,141 +589,96 @@ async def guest_download(
     """
 
     # Basic token validation (guest only)
-    if not x_auth_token or x_auth_token not in _SESSIONS:
+    entry = _live_session(x_auth_token)
+    if entry is None:
         raise HTTPException(status_code=401, detail="Invalid or missing token")
-    if _SESSIONS[x_auth_token] is not None:
+    if entry[0] is not None:
         raise HTTPException(status_code=400, detail="Not a guest session")
 
-    # Read uploaded HTML
+    # ------------------------------------------------------------------
+    # Parse HTML to obtain m3u8 URL & title (mirror get_video_stream_info).
+    # The upload is read in chunks and scanned with regexes until both the
+    # <source> and the vod_header <h1> are found; BeautifulSoup is only used
+    # as a fallback for whichever of the two they don't match.
+    # ------------------------------------------------------------------
+    buf = bytearray()
+    match = h1_match = None
+    header_end = -1  # end of the vod_header opening tag once seen (-2: no title in it)
     try:
-        raw = await file.read()
-        html_text = raw.decode("utf-8", errors="ignore")
+        while True:
+            chunk = await file.read(_UPLOAD_CHUNK)
+            if not chunk:
+                break
+            pos = max(0, len(buf) - _SCAN_OVERLAP)
+            buf += chunk
+            if match is None:
+                match = _M3U8_RE.search(buf, pos)
+            if header_end == -1:
+                header = _VOD_HEADER_RE.search(buf, pos)
+                if header is not None:
+                    header_end = header.end()
+            if header_end >= 0 and h1_match is None:
+                h1_match = _H1_RE.search(buf, max(pos, header_end))
+                if h1_match is not None and not _inside_header(buf, header_end, h1_match.start()):
+                    h1_match = None
+                    header_end = -2  # the header closed without an <h1>
+            if match is not None and h1_match is not None:
+                break
     except Exception:
         raise HTTPException(status_code=400, detail="파일을 읽는 중 오류가 발생했습니다.")
 
-    # ------------------------------------------------------------------
-    # Parse HTML to obtain m3u8 URL & title (mirror get_video_stream_info)
-    # ------------------------------------------------------------------
-    from bs4 import BeautifulSoup
-
-    soup = BeautifulSoup(html_text, "html.parser")
-
-    # Find m3u8 source tag
-    source_tag = soup.find("source", {"type": "application/x-mpegURL"})
-    if source_tag is None or not source_tag.get("src"):
+    m3u8_url: Optional[str] = None
+    extracted: Optional[str] = None
+    if match:
+        m3u8_url = unescape(match.group(1).decode("utf-8", errors="ignore"))
+    if h1_match:
+        extracted = _h1_text(bytes(h1_match.group(1)))
+    if match is None or h1_match is None:
+        # Whatever the regexes missed is read from the full parse, as before
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(buf.decode("utf-8", errors="ignore"), "lxml")
+        if m3u8_url is None:
+            source_tag = soup.find("source", {"type": "application/x-mpegURL"})
+            if source_tag is not None and source_tag.get("src"):
+                m3u8_url = source_tag["src"]
+        if extracted is None:
+            header_div = soup.find("div", id="vod_header")
+            if header_div is not None and header_div.find("h1") is not None:
+                h1 = header_div.find("h1")
+                for span in h1.find_all("span"):
+                    span.decompose()
+                extracted = h1.get_text(strip=True)
+
+    if not m3u8_url:
         raise HTTPException(status_code=400, detail="HTML 내에서 m3u8 <source> 태그를 찾을 수 없습니다.")
 
-    m3u8_url: str = source_tag["src"]
-
     # Extract and sanitise title
     title = file.filename.rsplit(".", 1)[0]
-    header_div = soup.find("div", id="vod_header")
-    if header_div is not None and header_div.find("h1") is not None:
-        h1 = header_div.find("h1")
-        for span in h1.find_all("span"):
-            span.decompose()
-        extracted = h1.get_text(strip=True)
-        if extracted:
-            invalid_chars = "\\/:*?\"<>|"
-            title = extracted.translate(str.maketrans(invalid_chars, '＼／：＊？＂＜＞｜'))
-
-    # Probe duration/bitrate using ffprobe if available (reuse logic above)
-    ffprobe_bin = os.getenv("FFPROBE_PATH") or shutil.which("ffprobe") or shutil.which("ffprobe.exe")
-    stream_duration: Optional[float] = None
-    stream_bitrate: Optional[int] = None
-    if ffprobe_bin:
-        try:
-            probe_cmd = [
-                ffprobe_bin,
-                "-v", "error",
-                "-show_entries", "format=duration,bit_rate",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                m3u8_url,
-            ]
-            result = subprocess.run(probe_cmd, capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                lines = [l.strip() for l in result.stdout.splitlines() if l.strip()]
-                if lines:
-                    try:
-                        stream_duration = float(lines[0])
-                    except ValueError:
-                        pass
-                    if len(lines) > 1:
-                        try:
-                            stream_bitrate = int(lines[1])
-                        except ValueError:
-                            pass
-        except Exception:
-            stream_duration = None
-            stream_bitrate = None
-
-    # ffmpeg command (same as /download)
-    ffmpeg_bin = os.getenv("FFMPEG_PATH") or shutil.which("ffmpeg") or shutil.which("ffmpeg.exe")
-    if not ffmpeg_bin:
-        raise HTTPException(status_code=500, detail="ffmpeg executable not found on server. Install ffmpeg and ensure it is in PATH.")
-
-    filename = f"{title}.{ext}"
-    headers = {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"}
-    if stream_duration:
-        headers["X-Stream-Duration"] = str(stream_duration)
-    if stream_bitrate:
-        headers["X-Stream-Bitrate"] = str(stream_bitrate)
-
-    if ext == "mp4":
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-            tmp_path = tmp.name
-
-        remux_cmd = [
-            ffmpeg_bin,
-            "-loglevel", "error",
-            "-y",
-            "-i", m3u8_url,
-            "-c", "copy",
-            "-bsf:a", "aac_adtstoasc",
-            "-movflags", "+faststart",
-            tmp_path,
-        ]
-
-        result = subprocess.run(remux_cmd, capture_output=True)
-        if result.returncode != 0:
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
-            raise HTTPException(status_code=500, detail="ffmpeg failed to remux video")
-
-        def _cleanup():
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
-
-        background_tasks = BackgroundTasks()
-        background_tasks.add_task(_cleanup)
-
-        return FileResponse(tmp_path, media_type="video/mp4", filename=filename, headers=headers, background=background_tasks)
-
-    codec_args = "-vn -c:a libmp3lame -b:a 192k -f mp3"
-    cmd = f"{shlex.quote(ffmpeg_bin)} -loglevel error -y -i {shlex.quote(m3u8_url)} {codec_args} pipe:1"
-
-    process = subprocess.Popen(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if process.stdout is None:
-        raise HTTPException(status_code=500, detail="Failed to initiate ffmpeg stream")
-
-    def iterfile():
-        try:
-            while True:
-                chunk = process.stdout.read(1024 * 1024)
-                if not chunk:
-                    break
-                yield chunk
-        finally:
-            process.stdout.close()
-            process.kill()
+    if extracted:
+        title = extracted.translate(_TITLE_TRANS)
 
-    return StreamingResponse(iterfile(), media_type="audio/mpeg", headers=headers)
+    url_key = hashlib.blake2b(m3u8_url.encode(), digest_size=16).digest()
+    return await _stream_media(m3u8_url, title, ext, request, probe_key=url_key)
 
 
 # ----------------------------- Static mount (last) -----------------------------
 _static_path = pathlib.Path(__file__).parent / "static"
-app.mount("/", StaticFiles(directory=_static_path, html=True), name="static") 
\ No newline at end of file
+app.mount("/", StaticFiles(directory=_static_path, html=True), name="static") 
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Sessions and caches live in process memory, so every worker has its own
+    # copy; with WEB_CONCURRENCY > 1 the proxy must pin a client to one worker
+    # (sticky sessions), otherwise tokens issued by one worker are unknown to
+    # the others. loop/http "auto" pick uvloop/httptools when installed.
+    uvicorn.run(
+        "backend:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="auto",
+        http="auto",
+        log_level="warning",
+    )
@@ -1,15 +1,139 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import logging
-from typing import Tuple, Optional
+import re
+import threading
+from html import unescape
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple, Optional
 
+import orjson
 import requests
-from bs4 import BeautifulSoup
-from Crypto.PublicKey import RSA
-from Crypto.Cipher import PKCS1_v1_5
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cachetools import TTLCache
+from lxml import html as lxml_html
+from selectolax.lexbor import LexborHTMLParser
+
+from learnus_parser import parse_assignment_detail, parse_course_activities_stream, parse_dashboard_courses
+
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
 
 logger = logging.getLogger(__name__)
 
+# Connection pool shared by every LearnUsClient.  Cookies stay per-Session, but
+# keep-alive TLS connections to ys.learnus.org / infra.yonsei.ac.kr are reused
+# across users, so a new login skips the handshakes.
+_SHARED_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    # Transient SSO failures are retried per request on the open connection
+    # instead of failing the whole multi-step login.
+    max_retries=Retry(
+        total=5,
+        connect=3,
+        read=3,
+        status=3,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "POST"]),
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    ),
+)
+# (connect, read) timeout for every request, caps the worst case with retries
+_TIMEOUT = (5, 15)
+
+# Matched against the raw PmSSOService body (bytes), so no text decode is needed
+_SSO_CHALLENGE_RE = re.compile(rb"var\s+ssoChallenge\s*=\s*['\"]([^'\"]+)['\"]")
+_RSA_MODULUS_RE = re.compile(rb"rsa\.setPublic\s*\(\s*['\"]([0-9a-fA-F]+)['\"]")
+
+@functools.lru_cache(maxsize=8)
+def _rsa_public_key(modulus_hex: str) -> RSAPublicKey:
+    """Public key for the SSO modulus (exponent 0x10001); the modulus rarely rotates."""
+    # cryptography (and bs4 below) are imported on first use so that worker
+    # start-up does not pay for code paths that only login/video pages hit.
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    return rsa.RSAPublicNumbers(0x10001, int(modulus_hex, 16)).public_key()
+
+
+def _rsa_encrypt_hex(modulus_hex: str, payload: bytes) -> str:
+    from cryptography.hazmat.primitives.asymmetric import padding
+
+    return _rsa_public_key(modulus_hex).encrypt(payload, padding.PKCS1v15()).hex()
+
+
+# Hidden inputs of the PmSSOAuthService login form, read with lxml in one pass
+_SSO_HIDDEN_INPUTS_XPATH = '//form[@action="/sso/PmSSOAuthService"]//input[@type="hidden"]'
+# SSO pages are UTF-8; pinning it keeps Korean values in raw bytes from being
+# decoded as Latin-1 when a page has no <meta charset>
+_HTML_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+# Build the video page soup only for the tags that are read
+_VIDEO_STRAINER_TAGS = ["source", "div"]
+
+# Filename-unsafe characters -> full-width look-alikes
+_INVALID_CHARS = '\\/:*?"<>|'
+_TITLE_TRANSLATION = str.maketrans(_INVALID_CHARS, "＼／：＊？＂＜＞｜")
+
+# Compiled <input name=... value=...> patterns (bytes, matched against the raw
+# response body), built on first use per name
+_INPUT_RE: Dict[str, re.Pattern] = {}
+
+
+def _input_re(name: str) -> re.Pattern:
+    pat = _INPUT_RE.get(name)
+    if pat is None:
+        pat = _INPUT_RE[name] = re.compile(
+            rb'<input[^>]+name=["\']' + re.escape(name.encode()) + rb'["\'][^>]*value=["\']([^"\']*)["\']', re.I
+        )
+    return pat
+
+
+def _match_input_values(body: bytes, names: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """Regex-only lookup: return (found values, names not matched)."""
+    values: Dict[str, str] = {}
+    missing = []
+    for n in names:
+        m = _input_re(n).search(body)
+        if m:
+            values[n] = unescape(m.group(1).decode("utf-8", errors="replace"))
+        else:
+            missing.append(n)
+    return values, missing
+
+
+def _find_input_values(body: bytes, names: List[str]) -> Optional[Dict[str, str]]:
+    """Return {name: value} for the given <input>s, or None if any is missing.
+
+    SSO pages use a fixed name-then-value layout, so a regex usually suffices;
+    anything it misses is looked up with a real parse.
+    """
+    values, missing = _match_input_values(body, names)
+    if missing:
+        tree = LexborHTMLParser(body)
+        for n in missing:
+            node = tree.css_first(f'input[name="{n}"]')
+            if node is None:
+                return None
+            values[n] = node.attributes.get("value")
+        values = {n: values[n] for n in names}
+    return values
+
+
+def _stream_input_values(res: requests.Response, names: List[str]) -> Optional[Dict[str, str]]:
+    """Like _find_input_values, but reads a `stream=True` response only until
+    every named <input> has been seen."""
+    buf = bytearray()
+    for chunk in res.iter_content(8192):
+        buf += chunk
+        values, missing = _match_input_values(buf, names)
+        if not missing:
+            return values
+    return _find_input_values(bytes(buf), names)
+
 
 class LearnUsLoginError(Exception):
     """Raised when SSO login to LearnUs fails."""
@@ -26,10 +150,38 @@ class LearnUsClient:
     """
 
     BASE_URL = "https://ys.learnus.org"
-    _BASE_HEADERS = {"User-Agent": "Mozilla/5.0"}
+    # Seconds a parsed course/assignment/dashboard page is reused per client
+    PAGE_TTL = 60
+
+    # Static part of the spLoginData.php form (tokens/credentials are merged in per call)
+    _SSO_TOKEN_TEMPLATE = {
+        "app_id": "ednetYonsei",
+        "retUrl": BASE_URL,
+        "failUrl": f"{BASE_URL}/login/index.php",
+        "baseUrl": BASE_URL,
+        "loginUrl": f"{BASE_URL}/passni/sso/coursemosLogin.php",
+        "ssoGubun": "Login",
+        "refererUrl": BASE_URL,
+        "test": "SSOAuthLogin",
+    }
+    _SESSION_HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "ko-KR,ko;q=0.9,en;q=0.8",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Connection": "keep-alive"
+    }
 
     def __init__(self) -> None:
-        self.session: Optional[requests.Session] = None
+        # One session per client (cookies), reused for login and every later
+        # page fetch; connections come from the module-wide pool.
+        self.session = requests.Session()
+        self.session.headers.update(self._SESSION_HEADERS)
+        self.session.mount("https://", _SHARED_ADAPTER)
+        self._authenticated = False
+        # {url: parsed result}, expired after PAGE_TTL; shared by the to_thread helpers
+        self._page_cache: TTLCache = TTLCache(maxsize=256, ttl=self.PAGE_TTL)
+        self._page_lock = threading.RLock()
 
     # ---------------------------------------------------------------------
     # Public helpers
@@ -44,69 +196,52 @@ class LearnUsClient:
         4. Encrypt credentials using RSA and submit to PmSSOAuthService
         5. Finalize with spLoginData.php and spLoginProcess.php
         """
-        import requests  # local import to be explicit
-        import re
-
-        session = requests.Session()
-        base_headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "ko-KR,ko;q=0.9,en;q=0.8",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive"
-        }
+        session = self.session
+        self._authenticated = False
 
         def post_request(url: str, headers: dict, data: dict):
-            res = session.post(url, headers=headers, data=data)
+            res = session.post(url, headers=headers, data=data, timeout=_TIMEOUT)
             res.raise_for_status()
             return res
 
-        def get_value_from_input(res_text: str, input_name: str):
-            soup = BeautifulSoup(res_text, "html.parser")
-            tag = soup.find("input", {"name": input_name})
-            return tag["value"] if tag else None
-
-        def get_multiple_values(res_text: str, names: list[str]):
-            soup = BeautifulSoup(res_text, "html.parser")
-            values = {}
-            for n in names:
-                tag = soup.find("input", {"name": n})
-                if not tag:
-                    return None
-                values[n] = tag["value"]
-            return values
+        def get_value_from_input(body: bytes, input_name: str):
+            vals = _find_input_values(body, [input_name])
+            return vals[input_name] if vals else None
 
-        def extract_js_rsa_keys(html_text: str):
+        def extract_js_rsa_keys(body: bytes):
             """Extract ssoChallenge and RSA modulus from JavaScript code."""
             # Extract ssoChallenge
-            challenge_match = re.search(r"var ssoChallenge\s*=\s*['\"]([^'\"]+)['\"]", html_text)
+            challenge_match = _SSO_CHALLENGE_RE.search(body)
             if not challenge_match:
                 raise LearnUsLoginError("ssoChallenge not found in JavaScript")
             
             # Extract RSA public key (modulus)
             # Look for the full hex string in setPublic call
-            modulus_match = re.search(r"rsa\.setPublic\s*\(\s*['\"]([0-9a-fA-F]+)['\"]", html_text)
+            modulus_match = _RSA_MODULUS_RE.search(body)
             if not modulus_match:
                 raise LearnUsLoginError("RSA modulus not found in JavaScript")
             
-            return challenge_match.group(1), modulus_match.group(1)
+            return challenge_match.group(1).decode("ascii"), modulus_match.group(1).decode("ascii")
 
         # Step 0: Establish proper session by visiting main page and login page
-        headers = base_headers.copy()
-        logger.info("[LearnUs] Establishing session...")
-        
-        # Visit main page first
-        session.get(f"{self.BASE_URL}/", headers=headers)
-        
-        # Visit login page to establish proper referrer chain
-        headers["Referer"] = f"{self.BASE_URL}/"
-        session.get(f"{self.BASE_URL}/login/index.php", headers=headers)
+        # (base headers are set on the session; only Referer varies per step).
+        # Skipped on re-login when the session already holds a MoodleSession.
+        headers: dict = {}
+        if "MoodleSession" not in session.cookies.get_dict(domain="ys.learnus.org"):
+            logger.info("[LearnUs] Establishing session...")
+
+            # Visit main page first
+            session.get(f"{self.BASE_URL}/", headers=headers, timeout=_TIMEOUT)
+
+            # Visit login page to establish proper referrer chain
+            headers["Referer"] = f"{self.BASE_URL}/"
+            session.get(f"{self.BASE_URL}/login/index.php", headers=headers, timeout=_TIMEOUT)
 
         # Step 1: Get S1 from spLogin2.php (now with proper Referer)
         headers["Referer"] = f"{self.BASE_URL}/login/index.php"
-        res = session.get(f"{self.BASE_URL}/passni/sso/spLogin2.php", headers=headers)
+        res = session.get(f"{self.BASE_URL}/passni/sso/spLogin2.php", headers=headers, timeout=_TIMEOUT)
         res.raise_for_status()
-        s1 = get_value_from_input(res.text, "S1")
+        s1 = get_value_from_input(res.content, "S1")
         if not s1:
             raise LearnUsLoginError("Failed to obtain S1 from spLogin2.php")
 
@@ -122,35 +257,30 @@ class LearnUsClient:
             "refererUrl": "",
         }
         res = post_request("https://infra.yonsei.ac.kr/sso/PmSSOService", headers, data)
+        # Work on the raw body: the key regexes are bytes patterns and lxml
+        # parses it as UTF-8, so Response.text is never decoded.
+        body = res.content
         
         # Step 3: Extract RSA keys from JavaScript in the response
         try:
-            sso_challenge, key_modulus = extract_js_rsa_keys(res.text)
+            sso_challenge, key_modulus = extract_js_rsa_keys(body)
         except LearnUsLoginError:
             raise LearnUsLoginError("Failed to extract RSA keys from PmSSOService JavaScript")
         
-        # Step 4: Encrypt credentials using RSA (same as before)
-        from Crypto.PublicKey import RSA
-        from Crypto.Cipher import PKCS1_v1_5
-        
-        key_pair = RSA.construct((int(key_modulus, 16), 0x10001))
-        cipher = PKCS1_v1_5.new(key_pair)
-        payload = f'{{"userid":"{username}","userpw":"{password}","ssoChallenge":"{sso_challenge}"}}'
-        e2 = cipher.encrypt(payload.encode()).hex()
+        # Step 4: Encrypt credentials using RSA (PKCS#1 v1.5, same as before)
+        e2 = self._encrypt_credentials(username, password, sso_challenge, key_modulus)
         
         # Extract form data from the login form
-        soup = BeautifulSoup(res.text, "html.parser")
-        form = soup.find("form", {"action": "/sso/PmSSOAuthService"})
-        if not form:
+        tree = lxml_html.fromstring(body, parser=_HTML_PARSER)
+        if not tree.xpath('//form[@action="/sso/PmSSOAuthService"]'):
             raise LearnUsLoginError("PmSSOAuthService form not found in PmSSOService response")
         
-        # Get all hidden inputs from the form
-        form_data = {}
-        for inp in form.find_all("input"):
-            name = inp.get("name")
-            value = inp.get("value", "")
-            if name and inp.get("type") == "hidden":
-                form_data[name] = value
+        # Get all hidden inputs from the form (selected in one XPath pass)
+        form_data = {
+            inp.get("name"): inp.get("value", "")
+            for inp in tree.xpath(_SSO_HIDDEN_INPUTS_XPATH)
+            if inp.get("name")
+        }
         
         # Step 5: Submit encrypted credentials to PmSSOAuthService
         headers["Referer"] = "https://infra.yonsei.ac.kr/sso/PmSSOService"
@@ -159,10 +289,21 @@ class LearnUsClient:
             "loginPasswd": password,
             "E2": e2,  # This was the missing piece!
         })
-        res = post_request("https://infra.yonsei.ac.kr/sso/PmSSOAuthService", headers, form_data)
-        
-        # Extract E3, E4, S2, CLTID from the response
-        vals = get_multiple_values(res.text, ["E3", "E4", "S2", "CLTID"])
+        # Streamed: the tokens sit near the top of the page, so stop reading as
+        # soon as all four are seen (last request to this host in the flow).
+        res = session.post(
+            "https://infra.yonsei.ac.kr/sso/PmSSOAuthService",
+            headers=headers,
+            data=form_data,
+            stream=True,
+            timeout=_TIMEOUT,
+        )
+        try:
+            res.raise_for_status()
+            # Extract E3, E4, S2, CLTID from the response
+            vals = _stream_input_values(res, ["E3", "E4", "S2", "CLTID"])
+        finally:
+            res.close()
         if not vals:
             raise LearnUsLoginError("Failed to obtain E3/E4/S2/CLTID from PmSSOAuthService")
         e3, e4, s2, cltid = vals["E3"], vals["E4"], vals["S2"], vals["CLTID"]
@@ -170,41 +311,36 @@ class LearnUsClient:
         # Step 6: Finalize login with spLoginData.php
         headers["Referer"] = "https://infra.yonsei.ac.kr/"
         data = {
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
+            **self._SSO_TOKEN_TEMPLATE,
             "E3": e3,
             "E4": e4,
             "S2": s2,
             "CLTID": cltid,
-            "ssoGubun": "Login",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
             "username": username,
             "password": password,
         }
         post_request(f"{self.BASE_URL}/passni/sso/spLoginData.php", headers, data)
         
         # Step 7: Complete session with spLoginProcess.php
-        session.get(f"{self.BASE_URL}/passni/spLoginProcess.php")
+        session.get(f"{self.BASE_URL}/passni/spLoginProcess.php", timeout=_TIMEOUT)
 
-        # Success – store session
-        self.session = session
+        # Success – mark session as authenticated
+        self._authenticated = True
         logger.info("[LearnUs] Authenticated as %s using 2025 flow (with proper Referer headers)", username)
 
     def ensure_logged_in(self) -> requests.Session:
-        if self.session is None:
+        if not self._authenticated:
             raise LearnUsLoginError("Client is not logged in. Call `login()` first.")
         return self.session
 
     def get_video_stream_info(self, video_page_url: str) -> Tuple[str, str]:
         """Return `(title, m3u8_url)` for a given LearnUs video page."""
+        from bs4 import BeautifulSoup, SoupStrainer
+
         session = self.ensure_logged_in()
-        res = session.get(video_page_url)
+        res = session.get(video_page_url, timeout=_TIMEOUT)
         res.raise_for_status()
-        soup = BeautifulSoup(res.text, "html.parser")
+        soup = BeautifulSoup(res.content, "lxml", parse_only=SoupStrainer(_VIDEO_STRAINER_TAGS))
 
         # Extract m3u8 source URL
         source_tag = soup.find("source", {"type": "application/x-mpegURL"})
@@ -219,178 +355,62 @@ class LearnUsClient:
         h1 = header_div.find("h1")
         for span in h1.find_all("span"):
             span.decompose()
-        title: str = h1.get_text(strip=True)
-        invalid_chars = '\\/:*?"<>|'
-        title = title.translate(str.maketrans(invalid_chars, "＼／：＊？＂＜＞｜"))
+        title: str = h1.get_text(strip=True).translate(_TITLE_TRANSLATION)
 
         return title, m3u8_url
 
-    def get_course_activities(self, course_id: int):
-        """Fetch course page HTML and parse activities list using learnus_parser."""
-        from learnus_parser import parse_course_activities  # local import to avoid circular
+    def _get_parsed(self, url: str, parse: Callable[[Any], Any], refresh: bool = False, stream: bool = False) -> Any:
+        """Fetch `url` and return `parse(body)`, reusing a result younger than PAGE_TTL.
 
+        With `stream=True`, `parse` receives the decoded raw response stream
+        instead of the buffered body.
+        """
         session = self.ensure_logged_in()
+        if not refresh:
+            with self._page_lock:
+                hit = self._page_cache.get(url)
+            if hit is not None:
+                return hit
+        res = session.get(url, timeout=_TIMEOUT, stream=stream)
+        try:
+            res.raise_for_status()
+            if stream:
+                res.raw.decode_content = True  # undo gzip/br while reading
+                result = parse(res.raw)
+            else:
+                result = parse(res.content)
+        finally:
+            res.close()
+        with self._page_lock:
+            self._page_cache[url] = result
+        return result
+
+    def get_course_activities(self, course_id: int, refresh: bool = False):
+        """Fetch course page HTML and parse activities list using learnus_parser."""
         url = f"{self.BASE_URL}/course/view.php?id={course_id}"
-        res = session.get(url)
-        res.raise_for_status()
-        return parse_course_activities(res.text)
+        # Course pages can be large; parse them as they arrive instead of buffering
+        return self._get_parsed(url, parse_course_activities_stream, refresh, stream=True)
 
-    def get_assignment_detail(self, assign_module_id: int):
+    def get_assignment_detail(self, assign_module_id: int, refresh: bool = False):
         """Return dictionary with submission/due information for a given assignment module."""
-        from learnus_parser import parse_assignment_detail
-
-        session = self.ensure_logged_in()
         url = f"{self.BASE_URL}/mod/assign/view.php?id={assign_module_id}"
-        res = session.get(url)
-        res.raise_for_status()
-        return parse_assignment_detail(res.text)
+        return self._get_parsed(url, parse_assignment_detail, refresh)
 
-    def get_courses(self):
+    def get_courses(self, refresh: bool = False):
         """Return list of courses as dicts {id, name}"""
-        from learnus_parser import parse_dashboard_courses
-
-        session = self.ensure_logged_in()
-        res = session.get(f"{self.BASE_URL}/")
-        res.raise_for_status()
-        return parse_dashboard_courses(res.text)
+        return self._get_parsed(f"{self.BASE_URL}/", parse_dashboard_courses, refresh)
 
     # ------------------------------------------------------------------
-    # Internal steps — closely mirror the original snippet
+    # Concurrent helpers (async callers)
     # ------------------------------------------------------------------
-    def _post(self, url: str, headers: dict, data: dict):
-        res = self.session.post(url, headers=headers, data=data)
-        res.raise_for_status()
-        return res
-
-    def _get_input_value(self, res_text: str, name: str) -> Optional[str]:
-        soup = BeautifulSoup(res_text, "html.parser")
-        tag = soup.find("input", {"name": name})
-        return tag["value"] if tag else None
-
-    def _get_multiple_input_values(self, res_text: str, names: list[str]) -> Optional[dict[str, str]]:
-        soup = BeautifulSoup(res_text, "html.parser")
-        values = {}
-        for n in names:
-            tag = soup.find("input", {"name": n})
-            if tag is None:
-                return None
-            values[n] = tag["value"]
-        return values
-
-    # ----- Step helpers --------------------------------------------------
-    def _step_0_coursemos(self, username: str, password: str) -> str:
-        headers = {**self._BASE_HEADERS, "Referer": f"{self.BASE_URL}/login/method/sso.php"}
-        data = {
-            "ssoGubun": "Login",
-            "logintype": "sso",
-            "type": "popup_login",
-            "username": username,
-            "password": password,
-        }
-        res = self._post(f"{self.BASE_URL}/passni/sso/coursemosLogin.php", headers, data)
-        s1 = self._get_input_value(res.text, "S1")
-        if not s1:
-            raise LearnUsLoginError("Failed to obtain S1 in step 0 (possible credential error)")
-        return s1
-
-    def _step_1_get_challenge(self, username: str, password: str, s1: str) -> Tuple[str, str]:
-        headers = {**self._BASE_HEADERS, "Referer": f"{self.BASE_URL}/"}
-        data = {
-            "ssoGubun": "Login",
-            "logintype": "sso",
-            "type": "popup_login",
-            "username": username,
-            "password": password,
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "S1": s1,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
-            "loginType": "invokeID",
-            "E2": "",
-        }
-        res = self._post("https://infra.yonsei.ac.kr/sso/PmSSOService", headers, data)
-        vals = self._get_multiple_input_values(res.text, ["ssoChallenge", "keyModulus"])
-        if vals is None:
-            raise LearnUsLoginError("Failed to obtain ssoChallenge/keyModulus in step 1")
-        return vals["ssoChallenge"], vals["keyModulus"]
+    async def login_async(self, username: str, password: str) -> None:
+        """`login()` run off the event loop; the SSO round trips block a worker thread, not the loop."""
+        await asyncio.to_thread(self.login, username, password)
 
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
     def _encrypt_credentials(self, username: str, password: str, sc: str, km: str) -> str:
-        key_pair = RSA.construct((int(km, 16), 0x10001))
-        cipher = PKCS1_v1_5.new(key_pair)
-        payload = f'{{"userid":"{username}","userpw":"{password}","ssoChallenge":"{sc}"}}'
-        return cipher.encrypt(payload.encode()).hex()
-
-    def _step_2_submit_credentials(self, username: str, password: str, s1: str, sc: str, km: str, e2: str) -> str:
-        headers = {**self._BASE_HEADERS, "Referer": "https://infra.yonsei.ac.kr/"}
-        data = {
-            "ssoGubun": "Login",
-            "logintype": "sso",
-            "type": "popup_login",
-            "username": username,
-            "password": password,
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
-            "loginType": "invokeID",
-            "E2": e2,
-            "S1": s1,
-            "ssoChallenge": sc,
-            "keyModulus": km,
-            "keyExponent": "10001",
-        }
-        res = self._post(f"{self.BASE_URL}/passni/sso/coursemosLogin.php", headers, data)
-        s1 = self._get_input_value(res.text, "S1")
-        if not s1:
-            raise LearnUsLoginError("Failed to obtain S1 in step 2")
-        return s1
-
-    def _step_3_get_tokens(self, username: str, password: str, s1: str) -> Tuple[str, str, str, str]:
-        headers = {**self._BASE_HEADERS, "Referer": f"{self.BASE_URL}/"}
-        data = {
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
-            "S1": s1,
-            "ssoGubun": "Login",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
-            "username": username,
-            "password": password,
-        }
-        res = self._post("https://infra.yonsei.ac.kr/sso/PmSSOAuthService", headers, data)
-        vals = self._get_multiple_input_values(res.text, ["E3", "E4", "S2", "CLTID"])
-        if vals is None:
-            raise LearnUsLoginError("Failed to get E3/E4/S2/CLTID in step 3")
-        return vals["E3"], vals["E4"], vals["S2"], vals["CLTID"]
-
-    def _step_4_finalise(self, username: str, password: str, e3: str, e4: str, s2: str, cltid: str) -> None:
-        headers = {**self._BASE_HEADERS, "Referer": "https://infra.yonsei.ac.kr/"}
-        data = {
-            "app_id": "ednetYonsei",
-            "retUrl": self.BASE_URL,
-            "failUrl": f"{self.BASE_URL}/login/index.php",
-            "baseUrl": self.BASE_URL,
-            "loginUrl": f"{self.BASE_URL}/passni/sso/coursemosLogin.php",
-            "E3": e3,
-            "E4": e4,
-            "S2": s2,
-            "CLTID": cltid,
-            "ssoGubun": "Login",
-            "refererUrl": self.BASE_URL,
-            "test": "SSOAuthLogin",
-            "username": username,
-            "password": password,
-        }
-        self._post(f"{self.BASE_URL}/passni/sso/spLoginData.php", headers, data)
-        # Final GET to finish creating the session cookies.
-        self.session.get(f"{self.BASE_URL}/passni/spLoginProcess.php") 
\ No newline at end of file
+        # orjson escapes quotes/backslashes in credentials and emits bytes directly
+        payload = orjson.dumps({"userid": username, "userpw": password, "ssoChallenge": sc})
+        return _rsa_encrypt_hex(km, payload)
@@ -2,14 +2,19 @@ from __future__ import annotations
 
 import re
 import datetime as dt
+import functools
 from dataclasses import dataclass, field
-from typing import List, Optional
+from html import unescape
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+from lxml.etree import XPath
 
 __all__ = [
     "Activity",
     "parse_course_activities",
+    "parse_course_activities_stream",
     "parse_assignment_detail",
     "parse_dashboard_courses",
 ]
@@ -33,113 +38,208 @@ _DATE_RANGE_RE = re.compile(
 )
 _LATE_RE = re.compile(r"Late\s*:\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
 
-# Accept both 'YYYY-MM-DD HH:MM:SS' and 'YYYY-MM-DD HH:MM'
-_DATETIME_PATTERNS = [
-    "%Y-%m-%d %H:%M:%S",
-    "%Y-%m-%d %H:%M",
-]
+# Accept both 'YYYY-MM-DD HH:MM:SS' and 'YYYY-MM-DD HH:MM' in a single match
+_DT_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{1,2})(?::(\d{1,2}))?")
 
 def _parse_datetime(ts: str) -> dt.datetime:
-    for fmt in _DATETIME_PATTERNS:
-        try:
-            return dt.datetime.strptime(ts, fmt)
-        except ValueError:
-            continue
-    raise ValueError(f"Unrecognised datetime format: {ts}")
+    m = _DT_RE.fullmatch(ts)
+    if m is None:
+        raise ValueError(f"Unrecognised datetime format: {ts}")
+    y, mo, d, h, mi, sec = m.groups()
+    # Out-of-range fields still raise ValueError from the constructor
+    return dt.datetime(int(y), int(mo), int(d), int(h), int(mi), int(sec) if sec else 0)
+
+
+# LearnUs pages are UTF-8; fixing it here keeps raw `res.content` bytes from
+# being decoded as Latin-1 when a page has no <meta charset>.
+_HTML_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+
+
+def _has_class(name: str) -> str:
+    """XPath predicate equivalent to the CSS class selector `.name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Course page selectors, compiled once (evaluated by libxml2)
+_ACTIVITY_XPATH = XPath(f"//li[{_has_class('activity')}]")
+_INSTANCENAME_XPATH = XPath(f"(.//span[{_has_class('instancename')}])[1]")
+_COMPLETION_SRC_XPATH = XPath(f"(.//span[{_has_class('autocompletion')}]//img)[1]/@src")
+_DISPLAYOPTIONS_XPATH = XPath(f"(.//span[{_has_class('displayoptions')}])[1]//text()")
+_PLAYABLE_XPATH = XPath(f"boolean(.//div[{_has_class('activityinstance')}]//a)")
+
+@functools.lru_cache(maxsize=None)
+def _css(selector: str):
+    """Compiled SoupSieve selector, built once per pattern (soupsieve comes with bs4)."""
+    import soupsieve
+
+    return soupsieve.compile(selector)
+
+
+# Trailing words that leak into titles from the span.accesshide child
+_TITLE_SUFFIXES = ("동영상", "과제")
+
 
+def _activity_entry(li) -> Optional[Tuple[int, Optional[Activity]]]:
+    """Return (module_id, Activity or None if unsupported) for one li.activity,
+    or None when the element carries no usable module id."""
+    classes = li.get("class", "").split()
+    # Identify module ID
+    module_id_str = li.get("id", "module-0").replace("module-", "")
+    try:
+        module_id = int(module_id_str)
+    except ValueError:
+        return None
 
-def parse_course_activities(html: str) -> List[Activity]:
+    # Determine type based on classes like 'modtype_vod', 'modtype_assign'
+    modtype = None
+    for cls in classes:
+        if cls.startswith("modtype_"):
+            modtype = cls.replace("modtype_", "")
+            break
+    if modtype not in {"vod", "assign"}:
+        return module_id, None  # skip unsupported types for now
+
+    # Title inside span.instancename (without nested span.accesshide)
+    span_name = _INSTANCENAME_XPATH(li)
+    if not span_name:
+        return module_id, None
+    title = "".join(t.strip() for t in span_name[0].itertext())
+    # Remove trailing '동영상' or '과제' word that came from accesshide span.
+    for suffix in _TITLE_SUFFIXES:
+        if title.endswith(suffix):
+            title = title[: -len(suffix)].rstrip()
+            break
+
+    # Completion status: check for <img ... src="...completion-auto-y.svg"> existing inside .autocompletion
+    comp_src = _COMPLETION_SRC_XPATH(li)
+    completed = bool(comp_src) and "completion-auto-y" in comp_src[0]
+
+    open_time = None
+    due_time = None
+    late_due_time = None
+
+    # Parse date range text if available (vod items have it)
+    display_parts = [t.strip() for t in _DISPLAYOPTIONS_XPATH(li)]
+    if display_parts:
+        text = " ".join(t for t in display_parts if t)
+        m = _DATE_RANGE_RE.search(text)
+        if m:
+            open_time = _parse_datetime(m.group(1))
+            due_time = _parse_datetime(m.group(2))
+        late_m = _LATE_RE.search(text)
+        if late_m:
+            late_due_time = _parse_datetime(late_m.group(1))
+
+    # -------------------------------------------------------------
+    # Availability: For VOD items, LearnUs renders an <a> tag with
+    # an onclick="window.open(...)" when the video is still
+    # viewable.  Once the viewing window is over, that anchor is
+    # replaced by a <div class="dimmed dimmed_text"> and thus the
+    # <a> tag is missing.  We use presence of the anchor as a
+    # heuristic for whether the video is still playable.
+    # -------------------------------------------------------------
+    playable = _PLAYABLE_XPATH(li)
+
+    return module_id, Activity(
+        id=module_id,
+        type=modtype,
+        title=title,
+        completed=completed,
+        open_time=open_time,
+        due_time=due_time,
+        late_due_time=late_due_time,
+        extra={"playable": playable},
+    )
+
+
+def _latest_activities(entries: Iterable[Tuple[int, Optional[Activity]]]) -> List[Activity]:
+    """Keep the last occurrence of every module id, in page order."""
+    # Later occurrences win (real week sections come after the "이번 주"
+    # shortcut section at the top).  Popping before re-inserting moves a
+    # repeated id to its latest position, so one forward pass is enough.
+    latest: Dict[int, Optional[Activity]] = {}
+    for module_id, activity in entries:
+        latest.pop(module_id, None)
+        latest[module_id] = activity
+    return [a for a in latest.values() if a is not None]
+
+
+def parse_course_activities(html: str | bytes) -> List[Activity]:
     """Parse LearnUs course page HTML and return list of Activity objects.
 
     Supports 'vod' (동영상) and 'assign' (과제) modules. Others are ignored for now.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    activities: list[Activity] = []
-    seen_ids: set[int] = set()
-
-    # Iterate in reverse to prefer activities appearing later (real week sections),
-    # skipping early duplicates from the "이번 주" shortcut section at the top.
-    for li in reversed(soup.select("li.activity")):
-        classes = li.get("class", [])
-        # Identify module ID
-        module_id_str = li.get("id", "module-0").replace("module-", "")
-        try:
-            module_id = int(module_id_str)
-        except ValueError:
-            continue
-
-        if module_id in seen_ids:
-            continue  # skip duplicates (e.g., current week appearing twice)
-        seen_ids.add(module_id)
-
-        # Determine type based on classes like 'modtype_vod', 'modtype_assign'
-        modtype = None
-        for cls in classes:
-            if cls.startswith("modtype_"):
-                modtype = cls.replace("modtype_", "")
-                break
-        if modtype not in {"vod", "assign"}:
-            continue  # skip unsupported types for now
-
-        # Title inside span.instancename (without nested span.accesshide)
-        span_name = li.select_one("span.instancename")
-        if not span_name:
-            continue
-        # Clone the span and remove any child with class accesshide
-        title = span_name.get_text(strip=True)
-        # Remove trailing '동영상' or '과제' word that came from accesshide span.
-        title = re.sub(r"\s*(동영상|과제)$", "", title)
-
-        # Completion status: check for <img ... src="...completion-auto-y.svg"> existing inside .autocompletion
-        completed = False
-        comp_img = li.select_one("span.autocompletion img")
-        if comp_img and comp_img.has_attr("src"):
-            if "completion-auto-y" in comp_img["src"]:
-                completed = True
-
-        open_time = None
-        due_time = None
-        late_due_time = None
-
-        # Parse date range text if available (vod items have it)
-        display_text = li.select_one("span.displayoptions")
-        if display_text:
-            text = display_text.get_text(" ", strip=True)
-            m = _DATE_RANGE_RE.search(text)
-            if m:
-                open_time = _parse_datetime(m.group(1))
-                due_time = _parse_datetime(m.group(2))
-            late_m = _LATE_RE.search(text)
-            if late_m:
-                late_due_time = _parse_datetime(late_m.group(1))
-
-        # -------------------------------------------------------------
-        # Availability: For VOD items, LearnUs renders an <a> tag with
-        # an onclick="window.open(...)" when the video is still
-        # viewable.  Once the viewing window is over, that anchor is
-        # replaced by a <div class="dimmed dimmed_text"> and thus the
-        # <a> tag is missing.  We use presence of the anchor as a
-        # heuristic for whether the video is still playable.
-        # -------------------------------------------------------------
-        playable = bool(li.select_one("div.activityinstance a"))
-
-        activities.append(
-            Activity(
-                id=module_id,
-                type=modtype,
-                title=title,
-                completed=completed,
-                open_time=open_time,
-                due_time=due_time,
-                late_due_time=late_due_time,
-                extra={"playable": playable},
-            )
-        )
-
-    return list(reversed(activities))
-
-
-def parse_assignment_detail(html: str) -> dict:
+    try:
+        tree = lxml_html.fromstring(html, parser=_HTML_PARSER)
+    except etree.ParserError:  # empty or whitespace-only document
+        return []
+    return _latest_activities(filter(None, map(_activity_entry, _ACTIVITY_XPATH(tree))))
+
+
+def _iter_activity_entries(source: BinaryIO) -> Iterator[Tuple[int, Optional[Activity]]]:
+    try:
+        for _, li in etree.iterparse(source, events=("end",), tag="li", html=True, encoding="utf-8"):
+            if "activity" not in li.get("class", "").split():
+                continue
+            entry = _activity_entry(li)
+            if entry is not None:
+                yield entry
+            li.clear()
+            while li.getprevious() is not None:
+                del li.getparent()[0]
+    except etree.XMLSyntaxError:
+        # Empty body: nothing to parse (same result as parse_course_activities)
+        return
+
+
+def parse_course_activities_stream(source: BinaryIO) -> List[Activity]:
+    """Like parse_course_activities, but reads the page incrementally from a
+    binary file-like object (e.g. a streamed response's `raw`).
+
+    Each li.activity is handled as soon as its end tag is parsed and then
+    dropped, together with everything before it, so the tree never holds more
+    than the current activity.
+    """
+    return _latest_activities(_iter_activity_entries(source))
+
+
+# Assignment status table: rows holding both a label (c0) and a value (c1) cell
+_LABEL_CELL = f"td[{_has_class('cell')} and {_has_class('c0')}]"
+_VALUE_CELL = f"td[{_has_class('cell')} and {_has_class('c1')}]"
+_STATUS_ROW_XPATH = XPath(f"//tr[.//{_LABEL_CELL} and .//{_VALUE_CELL}]")
+_LABEL_CELL_XPATH = XPath(f"(.//{_LABEL_CELL})[1]")
+_VALUE_CELL_XPATH = XPath(f"(.//{_VALUE_CELL})[1]")
+
+
+def _set_submission(info: dict, value: str) -> None:
+    info["submission_status"] = value
+    info["submitted"] = "완료" in value  # crude heuristic
+
+
+def _set_grading(info: dict, value: str) -> None:
+    info["grading_status"] = value
+
+
+def _set_due(info: dict, value: str) -> None:
+    try:
+        info["due_time"] = _parse_datetime(value)
+    except ValueError:
+        pass
+
+
+# Row label -> setter for the matching info field; other rows are ignored
+_ASSIGN_FIELD_SETTERS = {
+    "제출 여부": _set_submission,
+    "채점 상황": _set_grading,
+    "종료 일시": _set_due,
+}
+
+
+def _cell_text(td) -> str:
+    return "".join(t.strip() for t in td.itertext())
+
+
+def parse_assignment_detail(html: str | bytes) -> dict:
     """Parse LearnUs assignment detail page and extract submission + due info.
 
     Returns
@@ -150,40 +250,53 @@ def parse_assignment_detail(html: str) -> dict:
         grading_status : str | None
         due_time : datetime | None
     """
-    soup = BeautifulSoup(html, "html.parser")
     info = {
         "submitted": None,
         "submission_status": None,
         "grading_status": None,
         "due_time": None,
     }
-
-    for tr in soup.select("tr"):
-        label_td = tr.select_one("td.cell.c0")
-        value_td = tr.select_one("td.cell.c1")
-        if not label_td or not value_td:
-            continue
-        label = label_td.get_text(strip=True)
-        value = value_td.get_text(strip=True)
-        if label == "제출 여부":
-            info["submission_status"] = value
-            info["submitted"] = "완료" in value  # crude heuristic
-        elif label == "채점 상황":
-            info["grading_status"] = value
-        elif label == "종료 일시":
-            try:
-                info["due_time"] = _parse_datetime(value)
-            except ValueError:
-                pass
+    try:
+        tree = lxml_html.fromstring(html, parser=_HTML_PARSER)
+    except etree.ParserError:  # empty or whitespace-only document
+        return info
+    for tr in _STATUS_ROW_XPATH(tree):
+        setter = _ASSIGN_FIELD_SETTERS.get(_cell_text(_LABEL_CELL_XPATH(tr)[0]))
+        if setter is not None:
+            setter(info, _cell_text(_VALUE_CELL_XPATH(tr)[0]))
 
     return info
 
 
-def parse_dashboard_courses(html: str) -> List[dict]:
+# Course <option>s inside the dashboard's activity-course <select>
+_COURSE_SELECT_MARK = "form-control-my-activity-course"
+_COURSE_OPT_RE = re.compile(r"""<option[^>]*\svalue=["']\s*(\d+)\s*["'][^>]*>([^<]*)</option>""", re.I)
+
+
+def parse_dashboard_courses(html: str | bytes) -> List[dict]:
     """Parse main dashboard page and return list of courses with `id`, `name`."""
-    soup = BeautifulSoup(html, "html.parser")
+    # Fast path: regex over just the <select> region, no DOM at all
+    mark, close = _COURSE_SELECT_MARK, "</select>"
+    if isinstance(html, bytes):
+        mark, close = mark.encode(), close.encode()
+    start = html.find(mark)
+    if start == -1:
+        return []
+    end = html.find(close, start)
+    if end != -1:
+        region = html[start:end]
+        if isinstance(region, bytes):
+            region = region.decode("utf-8", errors="replace")
+        courses = [{"id": int(value), "name": unescape(text).strip()} for value, text in _COURSE_OPT_RE.findall(region)]
+        if courses:
+            return courses
+
+    # Unexpected markup: fall back to a full parse
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "lxml")
     courses = []
-    select = soup.select_one("select.form-control-my-activity-course")
+    select = _css("select.form-control-my-activity-course").select_one(soup)
     if not select:
         return courses
     for opt in select.find_all("option"):